@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /bcd/data/prep/ingest.py                                                            #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:30:04 am                                                #
+# Modified   : Sunday October 18th 2026 03:26:46 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+"""Ingestion Module"""
+from __future__ import annotations
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from bcd.data.repo.base import BatchResult
+from bcd.data.repo.image import DICOMImageRepo, list_dicom_files, read_headers
+from bcd.data.study.image import DICOMPassport
+from bcd.service.io.file import IOService
+
+
+# ------------------------------------------------------------------------------------------------ #
+@dataclass
+class IngestResult(BatchResult):
+    """Reports the outcome of an ingestion, image by image.
+
+    Args:
+        missing (list): File locations in the metadata for which no directory was found.
+        duration (float): Seconds from the start of the scan to the last registration.
+
+    """
+
+    missing: list = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Returns the number of images registered per second."""
+        return len(self.succeeded) / self.duration if self.duration > 0 else 0.0
+
+
+# ------------------------------------------------------------------------------------------------ #
+class Ingestor:
+    """Registers the images of a CBIS-DDSM download with a DICOMImageRepo.
+
+    The download is registered in place: the repository location is the root of the download,
+    and the file locations in the metadata are relative to it. No file is copied or rewritten.
+
+    Ingestion runs in three stages:
+        1. Scan: the series directories named in the metadata are listed with os.scandir on a
+           pool of threads.
+        2. Join: the files are joined to the metadata of their series, and the uids formatted,
+           with vectorized frame operations.
+        3. Register: the headers of the files are read on a pool of processes, a batch at a
+           time, to verify each file is a readable DICOM. The readable files in each batch are
+           registered with a single registry write, and progress is logged.
+
+    Only the header reads run on the process pool. Registration runs serially in the main
+    process, one batch at a time, while the pool reads the headers of the batches that follow.
+
+    Args:
+        repo (DICOMImageRepo): Mutable repository whose location is the root of the download.
+        metadata (str): Filepath of the metadata, with a row per series and the DICOMPassport
+            fields other than filename and uid as columns.
+        batch_size (int): Number of images verified and registered at a time.
+        max_workers (int): Maximum number of threads scanning directories and processes reading
+            headers. Defaults to the executor defaults.
+        io (IOService): Service used to read the metadata.
+
+    """
+
+    def __init__(
+        self,
+        repo: DICOMImageRepo,
+        metadata: str,
+        batch_size: int = 500,
+        max_workers: int = None,
+        io: IOService = IOService,
+    ) -> None:
+        self._repo = repo
+        self._metadata = metadata
+        self._batch_size = batch_size
+        self._max_workers = max_workers
+        self._io = io
+        self._logger = logging.getLogger(f"{self.__class__.__name__}")
+        if batch_size < 1:
+            msg = f"batch_size must be at least 1, not {batch_size}."
+            self._logger.error(msg)
+            raise ValueError(msg)
+
+    def run(self) -> IngestResult:
+        """Scans the download and registers the images not yet registered.
+
+        Images already registered, and files that aren't readable DICOMs, are reported as
+        failures.
+
+        Returns:
+            IngestResult reporting the uids registered, those that failed, the series
+            directories that are missing, and the duration of the ingestion.
+        """
+        start = time.perf_counter()
+        result = IngestResult()
+        metadata = self._io.read(self._metadata, index_col=None)
+        files, result.missing = self._scan(locations=metadata["file_location"].unique())
+        for location in result.missing:
+            msg = f"Series directory {location} was not found."
+            self._logger.warning(msg)
+        registrations = DICOMPassport.join(files=files, metadata=metadata)
+        msg = f"Scanned {len(registrations)} images in {time.perf_counter() - start:.1f} seconds."
+        self._logger.info(msg)
+        self._register(registrations=registrations, result=result, start=start)
+        result.duration = time.perf_counter() - start
+        msg = (
+            f"Registered {len(result.succeeded)} images in {result.duration:.1f} seconds "
+            f"({result.throughput:.0f} images/s); {len(result.failed)} failed."
+        )
+        self._logger.info(msg)
+        return result
+
+    def _scan(self, locations: list) -> tuple:
+        """Lists the DICOM files in the series directories on a pool of threads.
+
+        Returns:
+            Tuple of a frame of the file_location and filename of each file, and a list of the
+            locations whose directories are missing.
+        """
+        directories = [os.path.join(self._repo.location, location) for location in locations]
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            listings = list(executor.map(list_dicom_files, directories))
+        missing = [location for location, files in zip(locations, listings) if files is None]
+        rows = [
+            (location, name)
+            for location, files in zip(locations, listings)
+            for name, _, _ in files or []
+        ]
+        files = pd.DataFrame(data=rows, columns=["file_location", "filename"])
+        return files, missing
+
+    def _register(self, registrations: pd.DataFrame, result: IngestResult, start: float) -> None:
+        """Verifies and registers the images a batch at a time, logging progress."""
+        total = len(registrations)
+        batches = [
+            registrations.iloc[i : i + self._batch_size].to_dict("records")
+            for i in range(0, total, self._batch_size)
+        ]
+        with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+            futures = [
+                executor.submit(read_headers, [self._get_filepath(reg) for reg in batch])
+                for batch in batches
+            ]
+            done = 0
+            for batch, future in zip(batches, futures):
+                readable = []
+                for registration, error in zip(batch, future.result()):
+                    if error is None:
+                        readable.append(registration)
+                    else:
+                        msg = f"Image {registration['uid']} is unreadable.\n{error}"
+                        self._logger.error(msg)
+                        result.failed[registration["uid"]] = error
+                registered = self._repo.register_many(registrations=readable)
+                result.succeeded.extend(registered.succeeded)
+                result.failed.update(registered.failed)
+                done += len(batch)
+                elapsed = time.perf_counter() - start
+                msg = f"Processed {done} of {total} images ({done / elapsed:.0f} images/s)."
+                self._logger.info(msg)
+
+    def _get_filepath(self, registration: dict) -> str:
+        """Formats the filepath to an image in the download."""
+        return os.path.join(
+            self._repo.location, registration["file_location"], registration["filename"]
+        )
@@ -11,7 +11,7 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Thursday May 25th 2023 10:26:59 pm                                                  #
-# Modified   : Saturday June 3rd 2023 05:06:32 am                                                  #
+# Modified   : Sunday October 18th 2026 02:43:24 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
@@ -19,15 +19,156 @@
 """Repository Base Module"""
 from __future__ import annotations
 import os
+import fcntl
+import functools
+import threading
 from abc import ABC, abstractmethod
 import logging
-from typing import Any
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Union
 
 import pandas as pd
 
 from bcd.service.io.file import IOService
 
 
+# ------------------------------------------------------------------------------------------------ #
+@dataclass
+class BatchResult:
+    """Reports the outcome of a batch operation, item by item.
+
+    Args:
+        succeeded (list): The uids for which the operation succeeded, in the order requested.
+        failed (dict): Maps each uid for which the operation failed to the exception raised.
+        results (list): Entities returned by the operation, aligned with succeeded.
+
+    """
+
+    succeeded: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+    results: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Returns True if the operation succeeded for every item."""
+        return len(self.failed) == 0
+
+
+# ------------------------------------------------------------------------------------------------ #
+class ReadWriteLock:
+    """Reentrant lock that admits many concurrent readers or a single writer.
+
+    Writers are preferred: once a writer is waiting, new readers wait, so a steady stream of
+    readers can't starve it. The thread holding the write lock may also read. A thread holding
+    only the read lock can't acquire the write lock, as two such threads would deadlock.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting = 0
+        self._local = threading.local()
+
+    @property
+    def held(self) -> bool:
+        """Returns True if the current thread holds the read or write lock."""
+        return self._writer == threading.get_ident() or getattr(self._local, "reads", 0) > 0
+
+    @property
+    def reading(self) -> bool:
+        """Returns True if the current thread holds the read lock but not the write lock."""
+        return self._writer != threading.get_ident() and getattr(self._local, "reads", 0) > 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Holds the read lock for the duration of the block."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Holds the write lock for the duration of the block."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def acquire_read(self) -> None:
+        """Acquires the read lock, waiting while a writer holds or waits for the lock."""
+        if self._writer == threading.get_ident():
+            # Reads by the writer nest within the write lock.
+            self._writes += 1
+            return
+        reads = getattr(self._local, "reads", 0)
+        if reads == 0:
+            with self._condition:
+                while self._writer is not None or self._waiting > 0:
+                    self._condition.wait()
+                self._readers += 1
+        self._local.reads = reads + 1
+
+    def release_read(self) -> None:
+        """Releases the read lock."""
+        if self._writer == threading.get_ident():
+            self._writes -= 1
+            return
+        self._local.reads -= 1
+        if self._local.reads == 0:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """Acquires the write lock, waiting until all readers and any other writer release it."""
+        if self._writer == threading.get_ident():
+            self._writes += 1
+            return
+        if getattr(self._local, "reads", 0) > 0:
+            msg = "A read lock can't be upgraded to a write lock."
+            raise RuntimeError(msg)
+        with self._condition:
+            self._waiting += 1
+            while self._writer is not None or self._readers > 0:
+                self._condition.wait()
+            self._waiting -= 1
+            self._writer = threading.get_ident()
+            self._writes = 1
+
+    def release_write(self) -> None:
+        """Releases the write lock."""
+        with self._condition:
+            self._writes -= 1
+            if self._writes == 0:
+                self._writer = None
+                self._condition.notify_all()
+
+
+# ------------------------------------------------------------------------------------------------ #
+def read_locked(method: Callable) -> Callable:
+    """Decorates a Registry read method to run under the registry's read lock.
+
+    A registry that has changed on disk is reloaded under the write lock first. Nested calls run
+    under the lock already held.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._rwlock.held:
+            self._refresh()
+        with self._rwlock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 # ------------------------------------------------------------------------------------------------ #
 class Repo(ABC):
     """Base Repo class"""
@@ -36,8 +177,14 @@ class Repo(ABC):
         self._location = location
         self._registry = registry
         self._immutable = immutable
+        self._rwlock = ReadWriteLock()
         self._logger = logging.getLogger(f"{self.__class__.__name__}")
 
+    @property
+    def location(self) -> str:
+        """Returns the base directory of the repository."""
+        return self._location
+
     @property
     def immutable(self) -> bool:
         """Returns the value of the immutability variable."""
@@ -79,17 +226,50 @@ class Repo(ABC):
 
 # ------------------------------------------------------------------------------------------------ #
 class Registry(ABC):
+    """Base Registry class
+
+    The registry is held in memory and reloaded only when the backing file changes on disk. The
+    state of the file at the last load or save is captured in a (mtime, size, inode) signature.
+
+    Writes are safe across processes. A read-modify-write holds an exclusive advisory lock on a
+    '.lock' file next to the registry, reloads the registry if another process has changed it,
+    and applies its changes on top. The registry is written to a temporary file and renamed into
+    place, so readers never see a partial file.
+
+    Instances are safe to share across threads. Reads run concurrently under a read lock, and
+    writes and reloads run under the write lock. Writes replace the registry frame rather than
+    modifying it, so a frame returned by a read is a consistent snapshot.
+
+    Args:
+        filepath (str): Location of registry
+        io (IOService): Service used to read and write the registry file.
+
+    """
+
     def __init__(self, filepath: str, io: IOService = IOService) -> None:
         self._filepath = filepath
         self._io = io
         self._registry = pd.DataFrame()
+        # An empty tuple indicates the registry has never been loaded. None indicates no file.
+        self._signature = ()
+        self._lockfile = filepath + ".lock"
+        self._lock_fd = None
+        self._lock_depth = 0
+        self._rwlock = ReadWriteLock()
         self._logger = logging.getLogger(f"{self.__class__.__name__}")
 
     @property
+    @read_locked
     def registry(self) -> pd.DataFrame:
         """Returns the registry."""
+        self._load()
         return self._registry
 
+    @property
+    def filepath(self) -> str:
+        """Returns the location of the registry."""
+        return self._filepath
+
     @abstractmethod
     def get(self, *args, **kwargs) -> pd.DataFrame:
         """Get an item from the registry."""
@@ -106,8 +286,48 @@ class Registry(ABC):
     def remove(self, *args, **kwargs) -> None:
         """Removes an item from the registry."""
 
+    def clone(self, filepath: str) -> Registry:
+        """Returns a registry of the same type and options for the registry at filepath.
+
+        Override in subclasses whose constructors take options other than the filepath.
+        """
+        return self.__class__(filepath=filepath)
+
+    def copy(self, filepath: str) -> Registry:
+        """Copies the registry to filepath.
+
+        The copy is taken under the registry lock, so it's consistent with writes by other threads
+        and processes.
+
+        Args:
+            filepath (str): Location of the copy, which must not exist.
+
+        Returns:
+            A registry of the same type for the copy.
+        """
+        if os.path.exists(filepath):
+            msg = f"Registry {filepath} already exists."
+            self._logger.error(msg)
+            raise FileExistsError(msg)
+        registry = self.clone(filepath=filepath)
+        with self._lock():
+            self._copy_to(registry)
+        return registry
+
     def _load(self, force: bool = False) -> None:
-        """Loads the registry into the instance variable."""
+        """Loads the registry into the instance variable.
+
+        The file is only read if it has changed since the last load or save, unless forced.
+
+        Args:
+            force (bool): Reload the registry even if the file is unchanged.
+        """
+        if self._rwlock.reading:
+            # Readers use the registry as refreshed before the read lock was acquired.
+            return
+        signature = self._get_signature()
+        if not force and signature == self._signature:
+            return
         try:
             self._registry = self._io.read(self._filepath, index_col=None)
         except FileNotFoundError:
@@ -116,13 +336,96 @@ class Registry(ABC):
             msg = f"Exception of type {type(e)} occurred.\n{e}"
             self._logger.error(msg)
             raise e
+        self._signature = signature
+        self._build_index()
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Holds an exclusive lock on the registry across processes, and reloads it if changed.
+
+        The lock is reentrant within the instance, so locked operations can be nested. Threads in
+        the process are excluded by the write lock.
+        """
+        self._rwlock.acquire_write()
+        if self._lock_depth == 0:
+            os.makedirs(os.path.dirname(self._lockfile), exist_ok=True)
+            fd = os.open(self._lockfile, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except Exception as e:
+                os.close(fd)
+                self._rwlock.release_write()
+                msg = f"Exception of type {type(e)} occurred.\n{e}"
+                self._logger.error(msg)
+                raise e
+            self._lock_fd = fd
+        self._lock_depth += 1
+        try:
+            # Merge on write: changes are applied to the registry as last written by any process.
+            self._load()
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            self._rwlock.release_write()
+
+    def _copy_to(self, registry: Registry) -> None:
+        """Writes the registry to another, empty registry of the same type."""
+        with registry._lock():
+            registry._registry = self._registry
+            registry._build_index()
+            registry._save()
+
+    def _refresh(self) -> None:
+        """Reloads the registry under the write lock if it has changed on disk."""
+        if self._get_signature() != self._signature:
+            with self._rwlock.write():
+                self._load()
 
     def _save(self) -> None:
         """Saves the instance variable to file."""
         try:
             os.makedirs(os.path.dirname(self._filepath), exist_ok=True)
-            self._io.write(data=self._registry, filepath=self._filepath)
+            self._write()
         except Exception as e:
             msg = f"Exception of type {type(e)} occurred.\n{e}"
             self._logger.error(msg)
             raise e
+        # The in-memory registry is now in sync with the file; no reload is required.
+        self._signature = self._get_signature()
+
+    def _write(self) -> None:
+        """Writes the registry to file. Override to pass format specific options to the IOService."""
+        self._write_atomic(data=self._registry, filepath=self._filepath)
+
+    def _write_atomic(self, data: pd.DataFrame, filepath: str, **kwargs) -> None:
+        """Writes data to a temporary file and renames it over the filepath."""
+        stem, ext = os.path.splitext(filepath)
+        # The extension is kept, as the IOService selects the format from it.
+        tempfile = f"{stem}.{os.getpid()}.tmp{ext}"
+        try:
+            self._io.write(data=data, filepath=tempfile, **kwargs)
+            os.replace(tempfile, filepath)
+        finally:
+            if os.path.exists(tempfile):
+                os.remove(tempfile)
+
+    def _raise_on_failure(self, result: BatchResult) -> None:
+        """Raises the first exception reported by a single item batch operation."""
+        if not result.ok:
+            raise next(iter(result.failed.values()))
+
+    def _build_index(self) -> None:
+        """Builds in-memory lookup structures after the registry is loaded. Override in subclasses."""
+
+    def _get_signature(self) -> Union[tuple, None]:
+        """Returns the (mtime, size, inode) signature of the registry file, or None if missing."""
+        try:
+            stat = os.stat(self._filepath)
+        except FileNotFoundError:
+            return None
+        # Writes replace the file, so the inode changes even if the mtime and size don't.
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /bcd/data/repo/cache.py                                                             #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:22:11 am                                                #
+# Modified   : Sunday October 18th 2026 02:23:13 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+"""Cache Module"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+
+# ------------------------------------------------------------------------------------------------ #
+@dataclass
+class CacheStats:
+    """Reports the state of a cache and the outcome of lookups since it was created.
+
+    Args:
+        hits (int): Lookups that found the key.
+        misses (int): Lookups that didn't find the key.
+        evictions (int): Items evicted to keep the cache within its capacity.
+        items (int): Number of items in the cache.
+        size (int): Total size in bytes of the items in the cache.
+
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    items: int = 0
+    size: int = 0
+
+
+# ------------------------------------------------------------------------------------------------ #
+class LRUCache:
+    """Thread-safe least recently used cache bounded by the total size of its items in bytes.
+
+    Items are stored with a size given by the caller. Adding an item evicts the least recently
+    used items until the total size is within capacity. Items larger than the capacity aren't
+    cached.
+
+    Args:
+        capacity (int): Maximum total size of the cached items in bytes.
+
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._items = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Returns the capacity of the cache in bytes."""
+        return self._capacity
+
+    @property
+    def stats(self) -> CacheStats:
+        """Returns the hit, miss and eviction counters, and the number and size of items."""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                items=len(self._items),
+                size=self._size,
+            )
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the item for the key, marking it most recently used, or None if not cached."""
+        with self._lock:
+            try:
+                value, _ = self._items[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """Adds or replaces the item for the key, evicting least recently used items as needed.
+
+        Args:
+            key (Hashable): Key for the item.
+            value (Any): The item.
+            size (int): Size of the item in bytes.
+        """
+        with self._lock:
+            self._discard(key)
+            if size > self._capacity:
+                return
+            self._items[key] = (value, size)
+            self._size += size
+            while self._size > self._capacity:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= evicted
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Removes the item for the key, if cached."""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self) -> None:
+        """Removes all items. The counters are retained."""
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def _discard(self, key: Hashable) -> None:
+        """Removes the item for the key if cached. The lock must be held."""
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= item[1]
@@ -11,39 +11,157 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Thursday June 1st 2023 10:15:55 pm                                                  #
-# Modified   : Saturday June 3rd 2023 05:04:46 am                                                  #
+# Modified   : Sunday October 18th 2026 03:26:46 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
 # ================================================================================================ #
 """DICOMImage Repository"""
+from __future__ import annotations
+import io
 import os
+import glob
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Union
+
+import numpy as np
 import pandas as pd
 import pydicom
+from pydicom.dataelem import RawDataElement
+from pydicom.pixel_data_handlers.util import pixel_dtype
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
 
-from bcd.data.repo.base import Repo
+from bcd.data.repo.base import BatchResult, Registry, Repo
+from bcd.data.repo.cache import CacheStats, LRUCache
 from bcd.data.study.image import DICOMImage, DICOMPassport
-from bcd.data.repo.registry import DICOMImageRegistry
+
+
+# ------------------------------------------------------------------------------------------------ #
+@dataclass
+class RescanResult(BatchResult):
+    """Reports the outcome of a rescan, image by image.
+
+    Args:
+        added (list): The uids of the images registered.
+        updated (list): The uids of the images whose files changed, and were re-registered.
+        removed (list): The uids of the images whose files are missing, and were unregistered.
+        unchanged (int): The number of files unchanged since the last rescan.
+
+    """
+
+    added: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: int = 0
+
+
+# ------------------------------------------------------------------------------------------------ #
+def read_headers(filepaths: list) -> list:
+    """Reads the header of each DICOM file, skipping the pixel data.
+
+    Runs in the workers of an Ingestor or a rescan.
+
+    Returns:
+        List aligned with filepaths, holding None for each readable file, or the exception raised.
+    """
+    errors = []
+    for filepath in filepaths:
+        try:
+            pydicom.dcmread(fp=filepath, stop_before_pixels=True)
+        except Exception as e:
+            errors.append(e)
+        else:
+            errors.append(None)
+    return errors
+
+
+# ------------------------------------------------------------------------------------------------ #
+def list_dicom_files(directory: str) -> Union[list, None]:
+    """Lists the DICOM files in a directory with os.scandir.
+
+    Used by an Ingestor scan and a rescan.
+
+    Returns:
+        List of the (filename, size, mtime_ns) of each file, sorted by filename, or None if the
+        directory doesn't exist.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            files = []
+            for entry in entries:
+                if entry.name.endswith(".dcm") and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    except FileNotFoundError:
+        return None
+    return sorted(files)
 
 
 # ------------------------------------------------------------------------------------------------ #
 class DICOMImageRepo(Repo):
     """Encapsulates access to DICOM DICOMImages stored on disc
 
+    The repository is safe to share across threads. Reads run concurrently under a read lock, and
+    adds, updates and removes hold the write lock.
+
     Args:
         location (str): Base directory for the repository
-        registry (Registry): Registry for images containing the metadata (passport).
+        registry (Registry): Registry for images containing the metadata (passport), e.g.
+            ImageRegistry or SQLiteImageRegistry.
         immutable (bool): Indicates the mutability of the repository
+        cache_size (int): Capacity in bytes of the LRU cache of decoded datasets. Defaults to 0,
+            which disables the cache.
+        sidecar_dir (str): Directory for the decoded pixel sidecars. Defaults to 'pixels' in the
+            repository location.
+        pyramid_dir (str): Directory for the downsampled pyramid levels. Defaults to 'pyramid' in
+            the repository location.
+        pyramid_levels (int): Number of downsampled levels in each image's pyramid, each half the
+            size of the last. Defaults to 3, i.e. 1/2, 1/4 and 1/8 scale.
+        manifest (str): Filepath of the manifest of files kept by rescan. Defaults to
+            'manifest.parquet' in the repository location.
+        snapshot_dir (str): Directory for snapshots of the repository. Defaults to 'snapshots' in
+            the repository location.
 
     """
 
+    # Elements larger than this are deferred by a lazy get, e.g. PixelData.
+    __defer_size = "1 KB"
+    # Transfer syntaxes whose pixel data can be memory-mapped as a native little endian array.
+    __mappable = (ExplicitVRLittleEndian, ImplicitVRLittleEndian)
+    __pixel_data = 0x7FE00010
+    # Number of files whose headers are read per task by a rescan.
+    __header_batch_size = 100
+
     def __init__(
         self,
         location: str,
-        registry: DICOMImageRegistry,
+        registry: Registry,
         immutable: bool = True,
+        cache_size: int = 0,
+        sidecar_dir: str = None,
+        pyramid_dir: str = None,
+        pyramid_levels: int = 3,
+        manifest: str = None,
+        snapshot_dir: str = None,
     ) -> None:
         super().__init__(location=location, registry=registry, immutable=immutable)
+        self._cache = LRUCache(capacity=cache_size) if cache_size > 0 else None
+        self._sidecar_dir = sidecar_dir or os.path.join(location, "pixels")
+        self._pyramid_dir = pyramid_dir or os.path.join(location, "pyramid")
+        self._pyramid_levels = pyramid_levels
+        # Maps uid to the mtime of its file and the layout of its pixel data.
+        self._layouts = {}
+        self._manifest = manifest or os.path.join(location, "manifest.parquet")
+        self._snapshot_dir = snapshot_dir or os.path.join(location, "snapshots")
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        """Returns the dataset cache counters, or None if the cache is disabled."""
+        return self._cache.stats if self._cache is not None else None
 
     @property
     def registry(self) -> pd.DataFrame:
@@ -58,44 +176,556 @@ class DICOMImageRepo(Repo):
 
         """
         self._check_mutability()
-        # Send the passport as dictionary to the registry
-        self._registry.add(registration=image.passport.as_dict())
-        # Format the filepath combining the repository location and file location in the passport.
-        filepath = self._get_filepath(image.passport.as_dict())
-        # Save the dataset object to file.
-        self._save(dataset=image.dataset, filepath=filepath)
-
-    def get(self, uid: str) -> DICOMImage:
+        with self._rwlock.write():
+            # Send the passport as dictionary to the registry
+            self._registry.add(registration=image.passport.as_dict())
+            # Format the filepath from the repository location and file location in the passport.
+            filepath = self._get_filepath(image.passport.as_dict())
+            # Save the dataset object to file.
+            self._save(dataset=image.dataset, filepath=filepath)
+
+    def add_many(self, images: list) -> BatchResult:
+        """Adds a batch of DICOM images to the repository with a single registry write.
+
+        Images that fail registration are not saved. Images whose datasets can't be saved are
+        unregistered. Both are reported as failures. A dataset read from a file and not modified
+        since is saved by linking that file rather than re-encoding it.
+
+        Args:
+            images (list): List of DICOMImage objects.
+
+        Returns:
+            BatchResult reporting the uids added and those that failed.
+        """
+        self._check_mutability()
+        with self._rwlock.write():
+            result = self._registry.add_many(
+                registrations=[image.passport.as_dict() for image in images]
+            )
+            unsaved, _ = self._save_many(images=images, result=result)
+            if len(unsaved) > 0:
+                # Roll back registrations for images whose datasets could not be saved.
+                self._registry.remove_many(uids=unsaved)
+        return result
+
+    def import_file(self, passport: DICOMPassport, source: str) -> None:
+        """Adds a DICOM file to the repository without decoding it.
+
+        The file is hardlinked into the repository, or copied if it's on another filesystem.
+
+        Args:
+            passport (DICOMPassport): The passport for the image.
+            source (str): Filepath of the DICOM file.
+
+        """
+        self._check_mutability()
+        if not os.path.isfile(source):
+            msg = f"File {source} does not exist."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        with self._rwlock.write():
+            self._registry.add(registration=passport.as_dict())
+            try:
+                self._place(source=source, filepath=self._get_filepath(passport.as_dict()))
+            except Exception:
+                self._registry.remove(uid=passport.uid)
+                raise
+
+    def import_many(self, passports: list, sources: list) -> BatchResult:
+        """Adds a batch of DICOM files to the repository with a single registry write.
+
+        Files that fail registration are not placed. Files that can't be placed are
+        unregistered. Both are reported as failures.
+
+        Args:
+            passports (list): List of DICOMPassport objects.
+            sources (list): List of filepaths of the DICOM files, aligned with passports.
+
+        Returns:
+            BatchResult reporting the uids added and those that failed.
+        """
+        self._check_mutability()
+        if len(passports) != len(sources):
+            msg = f"Received {len(passports)} passports but {len(sources)} sources."
+            self._logger.error(msg)
+            raise ValueError(msg)
+        with self._rwlock.write():
+            result = self._registry.add_many(
+                registrations=[passport.as_dict() for passport in passports]
+            )
+            succeeded = set(result.succeeded)
+            unplaced = []
+            for passport, source in zip(passports, sources):
+                if passport.uid in succeeded:
+                    try:
+                        self._place(source=source, filepath=self._get_filepath(passport.as_dict()))
+                    except Exception as e:
+                        result.failed[passport.uid] = e
+                        unplaced.append(passport.uid)
+            if len(unplaced) > 0:
+                self._registry.remove_many(uids=unplaced)
+            result.succeeded = [uid for uid in result.succeeded if uid not in result.failed]
+        return result
+
+    def register_many(self, registrations: list) -> BatchResult:
+        """Registers a batch of images whose files are already in the repository.
+
+        The files are neither read nor written, so an image is registered in place, e.g. in a
+        download whose directory is the repository location.
+
+        Args:
+            registrations (list): List of image registrations in dictionary format, whose file
+                locations are relative to the repository location.
+
+        Returns:
+            BatchResult reporting the uids registered and those that failed.
+        """
+        self._check_mutability()
+        with self._rwlock.write():
+            return self._registry.add_many(registrations=registrations)
+
+    def get(self, uid: str, lazy: bool = False) -> DICOMImage:
         """Obtain a DICOMImage from the repository
 
+        Datasets returned from the cache are shared between gets, so they should be copied before
+        being modified.
+
         Args:
             uid (str): Unique identifier for the image
+            lazy (bool): Parse only the header, deferring pixel data until it's accessed.
         """
-        # Obtain the registration containing the passport attributes of the image from the registry
-        registration = self._registry.get(uid=uid)
-        # Extract and format the filepath including the repository location
-        filepath = self._get_filepath(registration=registration)
-        # Load the dataset from the filepath
-        dataset = self._load(filepath=filepath)
-        # Create the passport object for the image from the registration
-        passport = DICOMPassport.create(params=registration)
-        # Construct the image object with passport and dataset.
-        image = DICOMImage(passport=passport, dataset=dataset)
-        return image
+        with self._rwlock.read():
+            # Obtain the registration containing the passport attributes of the image
+            registration = self._registry.get(uid=uid)
+            return self._create(registration=registration, lazy=lazy)
+
+    def get_many(self, uids: list, lazy: bool = False, max_workers: int = None) -> BatchResult:
+        """Obtains a batch of DICOMImages from the repository.
+
+        The registrations are read from the registry in one pass, then the files are read on a
+        pool of threads. Images that can't be read are reported as failures.
+
+        Args:
+            uids (list): List of image uids.
+            lazy (bool): Parse only the headers, deferring pixel data until it's accessed.
+            max_workers (int): Maximum number of threads reading files. Defaults to the
+                ThreadPoolExecutor default.
+
+        Returns:
+            BatchResult with the images in results, in the order requested.
+        """
+        result = BatchResult()
+        with self._rwlock.read():
+            registrations = self._registry.get_many(uids=uids)
+            result.failed.update(registrations.failed)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    (uid, executor.submit(self._create, registration=registration, lazy=lazy))
+                    for uid, registration in zip(registrations.succeeded, registrations.results)
+                ]
+                for uid, future in futures:
+                    try:
+                        image = future.result()
+                    except Exception as e:
+                        result.failed[uid] = e
+                    else:
+                        result.succeeded.append(uid)
+                        result.results.append(image)
+        return result
+
+    def iter_images(
+        self,
+        criteria: dict = None,
+        batch_size: int = None,
+        prefetch: int = 8,
+        lazy: bool = False,
+        max_workers: int = None,
+    ) -> Iterator[Union[DICOMImage, list]]:
+        """Iterates over the images in the repository, reading ahead on background threads.
+
+        At most prefetch images are read ahead of the consumer, so memory is bounded by prefetch
+        plus batch_size images. Locks are held per image rather than for the whole iteration,
+        so writers aren't blocked while the consumer works.
+
+        Args:
+            criteria (dict): Registry column values to match, e.g. {"casetype": "calc"}.
+                Defaults to all images.
+            batch_size (int): If given, images are yielded in lists of up to batch_size images.
+            prefetch (int): Maximum number of images read ahead of the consumer.
+            lazy (bool): Parse only the headers, deferring pixel data until it's accessed.
+            max_workers (int): Maximum number of threads reading files. Defaults to the
+                ThreadPoolExecutor default.
+
+        Yields:
+            DICOMImage objects in registry order, or lists thereof if batch_size is given.
+        """
+        if prefetch < 1:
+            msg = f"prefetch must be at least 1, not {prefetch}."
+            self._logger.error(msg)
+            raise ValueError(msg)
+        uids = self._registry.query(**criteria) if criteria else self._registry.get_uids()
+        uids = iter(uids)
+        pending = deque()
+        batch = []
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for uid in uids:
+                pending.append(executor.submit(self.get, uid=uid, lazy=lazy))
+                if len(pending) == prefetch:
+                    break
+            while len(pending) > 0:
+                image = pending.popleft().result()
+                # Replace the image taken from the read-ahead before handing it to the consumer.
+                uid = next(uids, None)
+                if uid is not None:
+                    pending.append(executor.submit(self.get, uid=uid, lazy=lazy))
+                if batch_size is None:
+                    yield image
+                    continue
+                batch.append(image)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if len(batch) > 0:
+                yield batch
+        finally:
+            # Reached if the consumer stops early or a read fails; abandon the read-ahead.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_pixels(self, uid: str) -> np.ndarray:
+        """Returns the pixel array of an image, memory-mapped from its sidecar.
+
+        The sidecar is built from the DICOM file if it doesn't exist or is stale.
+
+        Args:
+            uid (str): Unique identifier for the image
+
+        Returns:
+            Read-only memory-mapped pixel array.
+        """
+        with self._rwlock.read():
+            registration = self._registry.get(uid=uid)
+            return self._get_pixels(uid=uid, filepath=self._get_filepath(registration))
+
+    def build_sidecars(self, uids: list = None, max_workers: int = None) -> BatchResult:
+        """Builds the pixel sidecars that are missing or stale, decoding files on a thread pool.
+
+        Sidecars are .npy files named by uid and the mtime of the source file, so a sidecar whose
+        source file has been modified since it was written is stale.
+
+        Args:
+            uids (list): List of image uids. Defaults to all images in the repository.
+            max_workers (int): Maximum number of threads decoding files. Defaults to the
+                ThreadPoolExecutor default.
+
+        Returns:
+            BatchResult with the sidecar filepaths in results, aligned with succeeded.
+        """
+        return self._map(self._build_sidecar, uids=uids, max_workers=max_workers)
+
+    def get_thumbnail(self, uid: str, max_dim: int) -> np.ndarray:
+        """Returns the pixel array of an image at a maximum dimension, from its pyramid.
+
+        The largest level whose rows and columns are at most max_dim is returned, memory-mapped
+        and without further resizing. If even the smallest level is larger, the smallest level is
+        returned. The pyramid is built from the DICOM file if it's missing or stale.
+
+        Args:
+            uid (str): Unique identifier for the image
+            max_dim (int): Maximum number of rows and columns.
+
+        Returns:
+            Read-only memory-mapped pixel array.
+        """
+        if max_dim < 1:
+            msg = f"max_dim must be at least 1, not {max_dim}."
+            self._logger.error(msg)
+            raise ValueError(msg)
+        with self._rwlock.read():
+            registration = self._registry.get(uid=uid)
+            filepath = self._get_filepath(registration)
+            levels = [np.load(level, mmap_mode="r") for level in self._get_levels(uid, filepath)]
+            fits = [level for level in levels if max(level.shape[:2]) <= max_dim]
+            if len(fits) < len(levels):
+                return fits[0] if len(fits) > 0 else levels[-1]
+            # Every level fits, so full resolution might too.
+            pixels = self._get_pixels(uid=uid, filepath=filepath)
+            if max(pixels.shape[:2]) <= max_dim or len(levels) == 0:
+                return pixels
+            return levels[0]
+
+    def get_region(self, uid: str, row_slice: slice, col_slice: slice) -> np.ndarray:
+        """Returns a window of the pixel array of an image.
+
+        If the file has an uncompressed little endian transfer syntax, its pixel data is
+        memory-mapped, and the window is a read-only view that reads only the rows it spans.
+        Otherwise the pixel data is decoded in full.
+
+        Args:
+            uid (str): Unique identifier for the image
+            row_slice (slice): Rows of the window.
+            col_slice (slice): Columns of the window.
+
+        Returns:
+            Pixel array of the window.
+        """
+        with self._rwlock.read():
+            registration = self._registry.get(uid=uid)
+            filepath = self._get_filepath(registration)
+            layout = self._get_layout(uid=uid, filepath=filepath)
+            if layout is None:
+                pixels = self._load(filepath=filepath).pixel_array
+            else:
+                offset, dtype, shape = layout
+                pixels = np.memmap(filepath, dtype=dtype, mode="r", offset=offset, shape=shape)
+            return pixels[row_slice, col_slice]
+
+    def build_pyramids(self, uids: list = None, max_workers: int = None) -> BatchResult:
+        """Builds the pyramids that are missing or stale, decoding files on a thread pool.
+
+        Each level of an image's pyramid averages 2x2 blocks of the level above, which also
+        serves as an anti-aliasing filter. Levels are saved as .npy files named by uid, source
+        mtime and level, so get_thumbnail needn't decode full resolution mammograms.
+
+        Args:
+            uids (list): List of image uids. Defaults to all images in the repository.
+            max_workers (int): Maximum number of threads building pyramids. Defaults to the
+                ThreadPoolExecutor default.
+
+        Returns:
+            BatchResult with lists of the level filepaths in results, aligned with succeeded.
+        """
+        return self._map(self._get_levels, uids=uids, max_workers=max_workers)
+
+    def rescan(self, metadata: pd.DataFrame, max_workers: int = None) -> RescanResult:
+        """Registers, re-registers and unregisters images whose files changed since the last rescan.
+
+        The size and mtime of each file are kept in a manifest. The directories named in the
+        metadata or the manifest are listed, and their files stat'd, on a pool of threads, and
+        compared with the manifest, so only new, changed and missing files are processed. Images
+        for new files are registered, those for changed files are re-registered and their cached
+        and derived data invalidated, and those for missing files are unregistered. Only the
+        headers of new and changed files are read, on the pool, to check they're readable. Files
+        are not written.
+
+        Files that are new or changed but whose series isn't in the metadata, or whose header
+        can't be read, are reported as failures, and retried on the next rescan.
+
+        Args:
+            metadata (pd.DataFrame): Metadata with a row per series, and the DICOMPassport fields
+                other than filename and uid as columns.
+            max_workers (int): Maximum number of threads listing directories and reading headers.
+                Defaults to the ThreadPoolExecutor default.
+
+        Returns:
+            RescanResult reporting the uids added, updated and removed, and those that failed.
+        """
+        self._check_mutability()
+        result = RescanResult()
+        manifest = self._read_manifest()
+        locations = pd.unique(pd.concat([metadata["file_location"], manifest["file_location"]]))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = executor.map(
+                list_dicom_files, [os.path.join(self._location, loc) for loc in locations]
+            )
+            # A missing directory has no files.
+            rows = [
+                (loc,) + entry
+                for loc, entries in zip(locations, listings)
+                for entry in entries or []
+            ]
+        keys = ["file_location", "filename"]
+        files = pd.DataFrame(data=rows, columns=keys + ["size", "mtime"])
+        diff = files.merge(
+            manifest,
+            on=keys,
+            how="outer",
+            suffixes=("", "_manifest"),
+            indicator=True,
+        )
+        present = diff["_merge"] == "both"
+        unchanged = present & (diff["size"] == diff["size_manifest"])
+        unchanged &= diff["mtime"] == diff["mtime_manifest"]
+        new = diff.loc[(diff["_merge"] == "left_only") | (present & ~unchanged), keys]
+        missing = diff.loc[diff["_merge"] == "right_only", "uid"]
+        result.unchanged = int(unchanged.sum())
+
+        registrations = DICOMPassport.join(files=new, metadata=metadata)
+        matched = pd.MultiIndex.from_frame(registrations[keys])
+        for location, filename in pd.MultiIndex.from_frame(new).difference(matched):
+            msg = f"File {filename} in {location} has no series metadata."
+            self._logger.error(msg)
+            result.failed[os.path.join(location, filename)] = ValueError(msg)
+        registrations = self._check_headers(
+            registrations=registrations, result=result, max_workers=max_workers
+        )
+
+        with self._rwlock.write():
+            registered = set(self._registry.get_uids())
+            exists = registrations["uid"].isin(registered)
+            added = self._registry.add_many(registrations=registrations[~exists].to_dict("records"))
+            updated = self._registry.update_many(
+                registrations=registrations[exists].to_dict("records")
+            )
+            removed = self._registry.remove_many(uids=[uid for uid in missing if uid in registered])
+            self._invalidate(uids=updated.succeeded + removed.succeeded)
+            for batch in (added, updated, removed):
+                result.succeeded.extend(batch.succeeded)
+                result.failed.update(batch.failed)
+            result.added = added.succeeded
+            result.updated = updated.succeeded
+            result.removed = removed.succeeded
+
+            # Files that failed are left out of the manifest, so they're retried.
+            uids = pd.concat([registrations[keys + ["uid"]], diff.loc[unchanged, keys + ["uid"]]])
+            manifest = files.merge(uids, on=keys)
+            self._write_manifest(manifest[~manifest["uid"].isin(result.failed.keys())])
+        msg = (
+            f"Rescan added {len(result.added)}, updated {len(result.updated)} and removed "
+            f"{len(result.removed)} images; {result.unchanged} unchanged, {len(result.failed)} "
+            "failed."
+        )
+        self._logger.info(msg)
+        return result
+
+    def _check_headers(
+        self, registrations: pd.DataFrame, result: BatchResult, max_workers: int = None
+    ) -> pd.DataFrame:
+        """Returns the registrations whose files' headers can be read, on a thread pool.
+
+        Images whose files are unreadable are reported as failed.
+        """
+        filepaths = [self._get_filepath(reg) for reg in registrations.to_dict("records")]
+        batches = [
+            filepaths[i : i + self.__header_batch_size]
+            for i in range(0, len(filepaths), self.__header_batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            errors = [error for batch in executor.map(read_headers, batches) for error in batch]
+        for uid, error in zip(registrations["uid"], errors):
+            if error is not None:
+                msg = f"Image {uid} is unreadable.\n{error}"
+                self._logger.error(msg)
+                result.failed[uid] = error
+        readable = np.array([error is None for error in errors], dtype=bool)
+        return registrations[readable]
+
+    def snapshot(self, name: str, max_workers: int = None) -> DICOMImageRepo:
+        """Creates a read-only, point in time copy of the repository in the snapshot directory.
+
+        Each image file is hardlinked into the snapshot, so its creation time depends on the
+        number of images, not their size. Files on another filesystem are copied. The registry is
+        copied under its lock, with the files linked under the read lock, so the snapshot is
+        consistent with writes to the repository. As the repository never writes files in place,
+        later updates replace its files rather than change those the snapshot shares.
+
+        Args:
+            name (str): Name of the snapshot.
+            max_workers (int): Maximum number of threads linking files. Defaults to the
+                ThreadPoolExecutor default.
+
+        Returns:
+            An immutable DICOMImageRepo for the snapshot.
+        """
+        location = os.path.join(self._snapshot_dir, name)
+        if os.path.exists(location):
+            msg = f"Snapshot {name} already exists."
+            self._logger.error(msg)
+            raise FileExistsError(msg)
+
+        def link(uid: str, filepath: str) -> None:
+            destination = os.path.join(location, os.path.relpath(filepath, self._location))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            self._link(source=filepath, destination=destination)
+
+        with self._rwlock.read():
+            result = self._map(func=link, max_workers=max_workers)
+            try:
+                if not result.ok:
+                    raise next(iter(result.failed.values()))
+                registry = self._registry.copy(filepath=self._get_snapshot_registry(location))
+            except Exception as e:
+                shutil.rmtree(location, ignore_errors=True)
+                msg = f"Exception of type {type(e)} occurred.\n{e}"
+                self._logger.error(msg)
+                raise e
+        return self.__class__(location=location, registry=registry, immutable=True)
+
+    def get_snapshot(self, name: str) -> DICOMImageRepo:
+        """Opens a snapshot of the repository.
+
+        Args:
+            name (str): Name of the snapshot.
+
+        Returns:
+            An immutable DICOMImageRepo for the snapshot.
+        """
+        location = os.path.join(self._snapshot_dir, name)
+        if not os.path.isdir(location):
+            msg = f"Snapshot {name} does not exist."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        registry = self._registry.clone(filepath=self._get_snapshot_registry(location))
+        return self.__class__(location=location, registry=registry, immutable=True)
+
+    def get_many_by_series(self, series_uid: str) -> BatchResult:
+        """Obtains the images in a series."""
+        return self.get_many(uids=self._registry.by_series(series_uid))
+
+    def get_many_by_study(self, study_uid: str) -> BatchResult:
+        """Obtains the images in a study."""
+        return self.get_many(uids=self._registry.by_study(study_uid))
+
+    def get_many_by_subject(self, subject_id: str) -> BatchResult:
+        """Obtains the images for a subject."""
+        return self.get_many(uids=self._registry.by_subject(subject_id))
+
+    def get_many_by_casetype(self, casetype: str) -> BatchResult:
+        """Obtains the images of a casetype, i.e. 'calc' or 'mass'."""
+        return self.get_many(uids=self._registry.by_casetype(casetype))
+
+    def get_many_by_fileset(self, fileset: str) -> BatchResult:
+        """Obtains the images in a fileset, i.e. 'train' or 'test'."""
+        return self.get_many(uids=self._registry.by_fileset(fileset))
 
     def update(self, image: DICOMImage) -> None:
-        """Update an existing DICOMImage
+        """Update an existing DICOMImage, writing only what changed as in update_many.
 
         Args:
             image (DICOMImage): A pydicom Dataset or subclass thereof.
         """
         self._check_mutability()
-        # Update the registry
-        self._registry.update(registration=image.passport.as_dict())
-        # Format the filepath from the repository location
-        filepath = self._get_filepath(registration=image.passport.as_dict())
-        # Save the dataset object to file.
-        self._save(dataset=image.dataset, filepath=filepath)
+        with self._rwlock.write():
+            # Update the registry
+            self._registry.update(registration=image.passport.as_dict())
+            # Format the filepath from the repository location
+            filepath = self._get_filepath(registration=image.passport.as_dict())
+            # Save the dataset object to file, unless it's unmodified.
+            if self._save(dataset=image.dataset, filepath=filepath):
+                self._invalidate(uids=[image.uid])
+
+    def update_many(self, images: list) -> BatchResult:
+        """Updates a batch of existing DICOM images with a single registry write.
+
+        Only what changed is written. For an image whose dataset is unmodified since it was read,
+        only the registry is written, and its cached and derived data are kept. For one whose
+        pixel data is unmodified, only the header is rewritten, and the encoded pixel data is
+        copied from the file.
+
+        Args:
+            images (list): List of DICOMImage objects.
+
+        Returns:
+            BatchResult reporting the uids updated and those that failed.
+        """
+        self._check_mutability()
+        with self._rwlock.write():
+            result = self._registry.update_many(
+                registrations=[image.passport.as_dict() for image in images]
+            )
+            unsaved, written = self._save_many(images=images, result=result)
+            self._invalidate(uids=unsaved + written)
+        return result
 
     def remove(self, uid: str) -> None:
         """Removes a image from the repository
@@ -104,34 +734,475 @@ class DICOMImageRepo(Repo):
             uid (str): The unique identifier for the image.
         """
         self._check_mutability()
-        # Get the registration for the image
-        registration = self._registry.get(uid=uid)
-        # Format and extract the filename for the dataset.
+        with self._rwlock.write():
+            self._invalidate(uids=[uid])
+            # Get the registration for the image
+            registration = self._registry.get(uid=uid)
+            # Format and extract the filename for the dataset.
+            filepath = self._get_filepath(registration=registration)
+            # Remove the dataset
+            self._delete(filepath)
+            # Remove the registration
+            self._registry.remove(uid=uid)
+
+    def remove_many(self, uids: list) -> BatchResult:
+        """Removes a batch of images from the repository with a single registry write.
+
+        Args:
+            uids (list): List of image uids.
+
+        Returns:
+            BatchResult reporting the uids removed and those that failed.
+        """
+        self._check_mutability()
+        result = BatchResult()
+        deleted = []
+        with self._rwlock.write():
+            self._invalidate(uids=uids)
+            for uid in uids:
+                try:
+                    registration = self._registry.get(uid=uid)
+                    self._delete(self._get_filepath(registration=registration))
+                except Exception as e:
+                    result.failed[uid] = e
+                else:
+                    deleted.append(uid)
+            removed = self._registry.remove_many(uids=deleted)
+        result.succeeded = removed.succeeded
+        result.failed.update(removed.failed)
+        return result
+
+    def _create(self, registration: dict, lazy: bool = False) -> DICOMImage:
+        """Creates an image from its registration, loading the dataset from file."""
+        # Extract and format the filepath including the repository location
         filepath = self._get_filepath(registration=registration)
-        # Remove the dataset
-        self._delete(filepath)
-        # Remove the registration
-        self._registry.remove(uid=uid)
+        uid = registration["uid"]
+        dataset = self._cache.get(uid) if self._cache is not None else None
+        if dataset is None:
+            # Load the dataset from the filepath
+            dataset = self._load(filepath=filepath, lazy=lazy)
+            # Lazy datasets aren't cached, as caching them would read the deferred pixel data.
+            if self._cache is not None and not lazy:
+                self._cache.put(uid, dataset, size=self._sizeof(dataset, filepath=filepath))
+        # Create the passport object for the image from the registration
+        passport = DICOMPassport.create(params=registration)
+        # Construct the image object with passport and dataset.
+        return DICOMImage(passport=passport, dataset=dataset)
 
-    def _load(self, filepath: str) -> pydicom.Dataset:
-        """Loads the image images from file."""
+    def _invalidate(self, uids: list) -> None:
+        """Removes the cached datasets and the pixel sidecars for the uids."""
+        for uid in uids:
+            if self._cache is not None:
+                self._cache.invalidate(uid)
+            self._layouts.pop(uid, None)
+            for sidecar in self._find_sidecars(uid) + self._find_levels(uid):
+                self._delete(sidecar)
 
+    def _get_pixels(self, uid: str, filepath: str) -> np.ndarray:
+        """Memory-maps the sidecar for the file, building it if it's missing or stale."""
+        sidecar = self._get_sidecar_filepath(uid=uid, filepath=filepath)
         try:
-            return pydicom.dcmread(fp=filepath)
+            return np.load(sidecar, mmap_mode="r")
+        except FileNotFoundError:
+            return np.load(self._build_sidecar(uid=uid, filepath=filepath), mmap_mode="r")
+
+    def _build_sidecar(self, uid: str, filepath: str) -> str:
+        """Decodes the pixel data of the file into a sidecar, unless it's current.
+
+        Stale sidecars for the uid are removed.
+
+        Returns:
+            Filepath of the sidecar.
+        """
+        sidecar = self._get_sidecar_filepath(uid=uid, filepath=filepath)
+        if os.path.exists(sidecar):
+            return sidecar
+        pixels = self._load(filepath=filepath).pixel_array
+        self._write_array(pixels, filepath=sidecar)
+        for stale in self._find_sidecars(uid):
+            if stale != sidecar:
+                self._delete(stale)
+        return sidecar
+
+    def _get_levels(self, uid: str, filepath: str) -> list:
+        """Builds the pyramid levels for the file, unless they're current.
+
+        Stale levels for the uid are removed.
+
+        Returns:
+            List of level filepaths, from the largest level to the smallest.
+        """
+        levels = [
+            self._get_level_filepath(uid=uid, filepath=filepath, level=level)
+            for level in range(1, self._pyramid_levels + 1)
+        ]
+        if all(os.path.exists(level) for level in levels):
+            return levels
+        pixels = self._load(filepath=filepath).pixel_array
+        for level in levels:
+            pixels = self._halve(pixels)
+            self._write_array(pixels, filepath=level)
+        for stale in self._find_levels(uid):
+            if stale not in levels:
+                self._delete(stale)
+        return levels
+
+    def _read_manifest(self) -> pd.DataFrame:
+        """Reads the manifest of the files at the last rescan, which is empty before the first."""
+        try:
+            return pd.read_parquet(self._manifest)
+        except FileNotFoundError:
+            return pd.DataFrame(
+                {
+                    "file_location": pd.Series(dtype="object"),
+                    "filename": pd.Series(dtype="object"),
+                    "size": pd.Series(dtype="int64"),
+                    "mtime": pd.Series(dtype="int64"),
+                    "uid": pd.Series(dtype="object"),
+                }
+            )
+
+    def _write_manifest(self, manifest: pd.DataFrame) -> None:
+        """Writes the manifest of the files at this rescan."""
+        manifest = manifest[["file_location", "filename", "size", "mtime", "uid"]]
+        self._write_file(
+            filepath=self._manifest,
+            write=lambda tempfile: manifest.to_parquet(tempfile, index=False),
+        )
+
+    def _get_layout(self, uid: str, filepath: str) -> Union[tuple, None]:
+        """Returns the offset, dtype and shape of the pixel data in the file.
+
+        The layout is read from the header of the file, and kept until the file is modified.
+
+        Returns:
+            The (offset, dtype, shape) tuple, or None if the pixel data can't be memory-mapped.
+        """
+        mtime = os.stat(filepath).st_mtime_ns
+        cached = self._layouts.get(uid)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        dataset = self._load(filepath=filepath, lazy=True)
+        # The raw element gives the position of the value in the file, without reading it.
+        element = dataset._dict.get(self.__pixel_data)
+        layout = None
+        if (
+            isinstance(element, RawDataElement)
+            and dataset.file_meta.get("TransferSyntaxUID") in self.__mappable
+            and dataset.BitsAllocated in (8, 16, 32, 64)
+            and int(dataset.get("NumberOfFrames", 1)) == 1
+            and dataset.get("PlanarConfiguration", 0) == 0
+        ):
+            dtype = pixel_dtype(dataset)
+            shape = (dataset.Rows, dataset.Columns)
+            if dataset.SamplesPerPixel > 1:
+                shape += (dataset.SamplesPerPixel,)
+            if element.length >= np.prod(shape) * dtype.itemsize:
+                layout = (element.value_tell, dtype, shape)
+        self._layouts[uid] = (mtime, layout)
+        return layout
+
+    def _write_array(self, array: np.ndarray, filepath: str) -> None:
+        """Saves an array to a .npy file.
+
+        The array is written to a temporary file and renamed, so readers never map a partial file.
+        """
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tempfile = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tempfile, "wb") as file:
+                np.save(file, array)
+            os.replace(tempfile, filepath)
+        except Exception as e:
+            if os.path.exists(tempfile):
+                os.remove(tempfile)
+            msg = f"Exception of type {type(e)} occurred.\n{e}"
+            self._logger.error(msg)
+            raise e
+
+    def _get_sidecar_filepath(self, uid: str, filepath: str) -> str:
+        """Formats the sidecar filepath from the uid and the mtime of the source file."""
+        return os.path.join(self._sidecar_dir, f"{uid}.{os.stat(filepath).st_mtime_ns}.npy")
+
+    def _find_sidecars(self, uid: str) -> list:
+        """Returns the filepaths of the sidecars for the uid, current or stale."""
+        pattern = os.path.join(glob.escape(self._sidecar_dir), glob.escape(uid) + ".*.npy")
+        sidecars = []
+        for sidecar in glob.glob(pattern):
+            # Other uids may share the prefix; the remainder must be the mtime alone.
+            mtime = os.path.basename(sidecar)[len(uid) + 1 : -len(".npy")]
+            if mtime.isdigit():
+                sidecars.append(sidecar)
+        return sidecars
+
+    def _get_level_filepath(self, uid: str, filepath: str, level: int) -> str:
+        """Formats the filepath of a pyramid level from the uid and the mtime of the source file."""
+        mtime = os.stat(filepath).st_mtime_ns
+        return os.path.join(self._pyramid_dir, f"{uid}.{mtime}.{level}.npy")
+
+    def _find_levels(self, uid: str) -> list:
+        """Returns the filepaths of the pyramid levels for the uid, current or stale."""
+        pattern = os.path.join(glob.escape(self._pyramid_dir), glob.escape(uid) + ".*.npy")
+        levels = []
+        for level in glob.glob(pattern):
+            # Other uids may share the prefix; the remainder must be the mtime and level alone.
+            suffix = os.path.basename(level)[len(uid) + 1 : -len(".npy")].split(".")
+            if len(suffix) == 2 and all(part.isdigit() for part in suffix):
+                levels.append(level)
+        return levels
+
+    def _map(self, func: Callable, uids: list = None, max_workers: int = None) -> BatchResult:
+        """Calls func with the uid and filepath of each image on a thread pool.
+
+        Args:
+            func (Callable): Function taking uid and filepath arguments.
+            uids (list): List of image uids. Defaults to all images in the repository.
+            max_workers (int): Maximum number of threads. Defaults to the ThreadPoolExecutor
+                default.
+
+        Returns:
+            BatchResult with the return values of func in results, aligned with succeeded.
+        """
+        result = BatchResult()
+        with self._rwlock.read():
+            uids = self._registry.get_uids() if uids is None else uids
+            registrations = self._registry.get_many(uids=uids)
+            result.failed.update(registrations.failed)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    (uid, executor.submit(func, uid, self._get_filepath(reg)))
+                    for uid, reg in zip(registrations.succeeded, registrations.results)
+                ]
+                for uid, future in futures:
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        result.failed[uid] = e
+                    else:
+                        result.succeeded.append(uid)
+                        result.results.append(value)
+        return result
+
+    @staticmethod
+    def _halve(pixels: np.ndarray) -> np.ndarray:
+        """Downsamples a pixel array by half, averaging each 2x2 block of pixels.
+
+        A trailing odd row or column is dropped. A single row or column isn't halved.
+        """
+        rows = 2 if pixels.shape[0] > 1 else 1
+        cols = 2 if pixels.shape[1] > 1 else 1
+        pixels = pixels[: pixels.shape[0] // rows * rows, : pixels.shape[1] // cols * cols]
+        # Four 8 or 16-bit values sum exactly in 32 bits, with less memory traffic than 64 bits.
+        width = np.int32 if pixels.dtype.itemsize <= 2 else np.int64
+        total = pixels[::rows, ::cols].astype(np.promote_types(pixels.dtype, width))
+        for row, col in [(1, 0), (0, 1), (1, 1)]:
+            if row < rows and col < cols:
+                total += pixels[row::rows, col::cols]
+        if np.issubdtype(pixels.dtype, np.integer):
+            # Rounds halves up.
+            total += rows * cols // 2
+            total //= rows * cols
+        else:
+            total /= rows * cols
+        return total.astype(pixels.dtype)
+
+    @staticmethod
+    def _sizeof(dataset: pydicom.Dataset, filepath: str) -> int:
+        """Decodes the pixel data and returns the size of the dataset in bytes.
+
+        The size is estimated as the size of the file plus the size of the decoded pixel array.
+        """
+        size = os.path.getsize(filepath)
+        if "PixelData" in dataset:
+            size += dataset.pixel_array.nbytes
+        return size
+
+    def _save_many(self, images: list, result: BatchResult) -> tuple:
+        """Saves the datasets of the images registered in a batch.
+
+        Images whose datasets can't be saved are moved from succeeded to failed in the result.
+
+        Returns:
+            Tuple of the list of uids for the images that could not be saved, and the list of
+            uids for the images whose files were written.
+        """
+        unsaved = []
+        written = []
+        succeeded = set(result.succeeded)
+        for image in images:
+            if image.uid in succeeded:
+                filepath = self._get_filepath(registration=image.passport.as_dict())
+                try:
+                    if self._save(dataset=image.dataset, filepath=filepath):
+                        written.append(image.uid)
+                except Exception as e:
+                    result.failed[image.uid] = e
+                    unsaved.append(image.uid)
+        result.succeeded = [uid for uid in result.succeeded if uid not in result.failed]
+        return unsaved, written
+
+    def _load(self, filepath: str, lazy: bool = False) -> pydicom.Dataset:
+        """Loads the image images from file, deferring large elements if lazy."""
+
+        try:
+            return pydicom.dcmread(fp=filepath, defer_size=self.__defer_size if lazy else None)
         except Exception as e:
             msg = f"Exception of type {type(e)} occurred.\n{e}"
             self._logger.error(msg)
             raise e
 
-    def _save(self, dataset: pydicom.Dataset, filepath: str) -> None:
-        """Saves the image Datasets to file."""
+    def _save(self, dataset: pydicom.Dataset, filepath: str) -> bool:
+        """Saves the image Datasets to file.
+
+        A dataset read from a file is compared with it. If it's unmodified, the file is placed
+        rather than re-encoded; if only the header is modified, the header is written and the
+        encoded pixel data is copied from the file.
+
+        Returns:
+            True if the file at the filepath was written, False if it was already current.
+        """
+        source = getattr(dataset, "filename", None)
+        if isinstance(source, str) and os.path.isfile(source):
+            original = self._load(filepath=source, lazy=True)
+            header, pixels = self._diff(dataset=dataset, original=original)
+            if not header and not pixels:
+                return self._place(source=source, filepath=filepath)
+            if not pixels and self._is_spliceable(dataset=dataset, original=original):
+                self._write_file(
+                    filepath=filepath,
+                    write=lambda tempfile: self._splice(dataset, original, source, tempfile),
+                )
+                return True
+        self._write_file(
+            filepath=filepath,
+            write=lambda tempfile: pydicom.dcmwrite(filename=tempfile, dataset=dataset),
+        )
+        return True
+
+    def _place(self, source: str, filepath: str) -> bool:
+        """Places a file at the filepath with a hardlink, or a copy if it can't be linked.
+
+        Returns:
+            True if the file was placed, False if the filepath is already the file.
+        """
+        if os.path.exists(filepath) and os.path.samefile(source, filepath):
+            return False
+        self._write_file(filepath=filepath, write=lambda tempfile: self._link(source, tempfile))
+        return True
+
+    def _write_file(self, filepath: str, write: Callable) -> None:
+        """Writes a file to a temporary file with the write function, and renames it into place.
+
+        Renaming also unlinks any file sharing the inode, so files linked into the repository
+        are never changed.
+        """
+        tempfile = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            pydicom.dcmwrite(filename=filepath, dataset=dataset)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            write(tempfile)
+            os.replace(tempfile, filepath)
         except Exception as e:
+            if os.path.exists(tempfile):
+                os.remove(tempfile)
             msg = f"Exception of type {type(e)} occurred.\n{e}"
             self._logger.error(msg)
             raise e
 
+    def _link(self, source: str, destination: str) -> None:
+        """Hardlinks a file, or copies it if it can't be linked."""
+        try:
+            os.link(source, destination)
+        except OSError:
+            # Across filesystems, or where the filesystem doesn't support hardlinks.
+            with open(source, "rb", buffering=0) as src:
+                with open(destination, "wb", buffering=0) as dst:
+                    self._copy_range(src=src, dst=dst, offset=0)
+
+    def _splice(
+        self, dataset: pydicom.Dataset, original: pydicom.Dataset, source: str, filepath: str
+    ) -> None:
+        """Writes the header of a dataset, followed by the pixel data element copied from source.
+
+        The pixel data must be the last element of both datasets, which must share an encoding.
+        """
+        header = pydicom.Dataset(
+            {tag: dataset.get_item(tag) for tag in dataset.keys() if tag != self.__pixel_data}
+        )
+        header.file_meta = dataset.file_meta
+        header.preamble = dataset.preamble
+        header.is_implicit_VR = dataset.is_implicit_VR
+        header.is_little_endian = dataset.is_little_endian
+        pydicom.dcmwrite(filename=filepath, dataset=header)
+        # The element's tag and length precede its value, with the VR and two reserved bytes
+        # in between if the VR is explicit.
+        element = original._dict[self.__pixel_data]
+        offset = element.value_tell - (8 if original.is_implicit_VR else 12)
+        # Opened for update rather than append, as copy_file_range rejects append mode files.
+        with open(source, "rb", buffering=0) as src, open(filepath, "r+b", buffering=0) as dst:
+            dst.seek(0, os.SEEK_END)
+            self._copy_range(src=src, dst=dst, offset=offset)
+
+    @staticmethod
+    def _copy_range(src: io.FileIO, dst: io.FileIO, offset: int) -> None:
+        """Copies a file from the offset to its end onto another, within the kernel.
+
+        copy_file_range lets the filesystem share blocks or copy server-side where it can. Where
+        it's unavailable, sendfile is used, then a copy through user space.
+        """
+        position = offset
+        end = os.fstat(src.fileno()).st_size
+        try:
+            while position < end:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), end - position, position)
+                if copied == 0:
+                    break
+                position += copied
+            return
+        except (AttributeError, OSError):
+            pass
+        try:
+            while position < end:
+                copied = os.sendfile(dst.fileno(), src.fileno(), position, end - position)
+                if copied == 0:
+                    break
+                position += copied
+            return
+        except OSError:
+            pass
+        src.seek(position)
+        shutil.copyfileobj(src, dst)
+
+    def _is_spliceable(self, dataset: pydicom.Dataset, original: pydicom.Dataset) -> bool:
+        """Returns True if the pixel data of the original can follow the header of the dataset."""
+        syntax = dataset.get("file_meta", {}).get("TransferSyntaxUID")
+        return (
+            self.__pixel_data in dataset
+            and max(dataset.keys()) == self.__pixel_data
+            and max(original.keys()) == self.__pixel_data
+            and isinstance(original._dict[self.__pixel_data], RawDataElement)
+            and syntax == original.get("file_meta", {}).get("TransferSyntaxUID")
+            and dataset.is_implicit_VR == original.is_implicit_VR
+            and dataset.is_little_endian == original.is_little_endian
+        )
+
+    def _diff(self, dataset: pydicom.Dataset, original: pydicom.Dataset) -> tuple:
+        """Compares a dataset with the original dataset in the file it was read from.
+
+        Returns:
+            Tuple of booleans indicating whether the header and the pixel data differ.
+        """
+        tags = (set(dataset.keys()) | set(original.keys())) - {self.__pixel_data}
+        header = dataset.get("file_meta") != original.get("file_meta") or any(
+            dataset.get(tag) != original.get(tag) for tag in tags
+        )
+        element = dataset._dict.get(self.__pixel_data)
+        if isinstance(element, RawDataElement):
+            # Elements are converted when accessed, so the pixel data hasn't been read or set.
+            pixels = False
+        else:
+            pixels = dataset.get("PixelData") != original.get("PixelData")
+        return header, pixels
+
     def _delete(self, filepath: str) -> None:
         """Deletes a image from disk"""
         try:
@@ -141,6 +1212,10 @@ class DICOMImageRepo(Repo):
             self._logger.error(msg)
             raise e
 
+    def _get_snapshot_registry(self, location: str) -> str:
+        """Returns the filepath of the registry in a snapshot, named as the repository's is."""
+        return os.path.join(location, os.path.basename(os.path.normpath(self._registry.filepath)))
+
     def _get_filepath(self, registration: dict) -> str:
         """Formats the filepath to the image."""
 
@@ -11,48 +11,124 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Friday June 2nd 2023 06:46:16 pm                                                    #
-# Modified   : Saturday June 3rd 2023 05:09:36 am                                                  #
+# Modified   : Sunday October 18th 2026 03:26:16 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
 # ================================================================================================ #
+"""Image Registry Module"""
+import os
+import csv
+import json
+from typing import Any, Union
 
-
+import numpy as np
 import pandas as pd
 
-from bcd.data.repo.base import Registry
+from bcd.data.repo.base import BatchResult, Registry, read_locked
 
 
 # ------------------------------------------------------------------------------------------------ #
 class ImageRegistry(Registry):
     """Registry for DICOM image
 
+    Registrations are indexed in memory by uid, so lookups are constant time and the registry file
+    is only re-read when it changes on disk. In memory, columns that repeat a handful of values
+    are held as categoricals and numeric columns are downcast, per the schema.
+
+    Each image is assigned a dense int32 id at registration, stored in the 'id' column. Ids are
+    kept on update, so they are stable for the life of the registration, and to_ids and to_uids
+    map between uids and ids in either direction. The ids of removed images are not reassigned:
+    the next id is saved in registry.ids.json, written before the registry itself.
+
+    CSV registries are written with a uid index sidecar: the uids sorted in a fixed-width array,
+    with the byte offset and length of each row in the file, saved as registry.uidx.npy. The
+    sidecar's metadata, registry.uidx.json, records the signature of the file it indexes and the
+    dtypes its columns are read with, so indexed rows parse as loaded rows do. Before the registry
+    is loaded, get memory-maps the sidecar, binary searches it for the uid and parses only that
+    row, so a cold lookup doesn't parse the whole file.
+
     Args:
         filepath (str): Location of registry
 
     """
 
+    # Maps columns to 'category', a numpy dtype, or the pd.to_numeric downcast type.
+    _schema = {
+        "id": "int32",
+        "collection": "category",
+        "data_description_uri": "category",
+        "modality": "category",
+        "sop_class_name": "category",
+        "sop_class_uid": "category",
+        "casetype": "category",
+        "fileset": "category",
+        "number_of_images": "integer",
+        "file_size": "integer",
+    }
+    # Whether rows can be located by byte offset in the registry file, so a uid index is kept.
+    _uid_indexed = True
+
     def __init__(self, filepath: str) -> None:
         super().__init__(filepath=filepath)
+        self._index = {}
+        # Secondary indexes mapping column values to row positions, built on first use per load.
+        self._secondary = {}
+        self._next_id = 0
+        stem = os.path.splitext(filepath)[0]
+        self._uid_index_filepath = stem + ".uidx.npy"
+        self._uid_index_metapath = stem + ".uidx.json"
+        self._uid_index = None
+        self._next_id_filepath = stem + ".ids.json"
 
     @property
+    @read_locked
     def count(self) -> int:
         """Returns number of registered images'."""
-        return len(self.get_uids())
+        self._load()
+        return len(self._index)
 
     def add(self, registration: dict) -> None:
         """Adds a image registration to the registry."""
-        self._load()
+        result = self.add_many(registrations=[registration])
+        self._raise_on_failure(result)
 
-        if not self._exists(uid=registration["uid"]):
-            # Convert the registration to DataFrame format and append to registry
-            registration = pd.DataFrame(data=registration, index=[0])
-            self._registry = pd.concat([self._registry, registration], axis=0)
-        else:
-            msg = f"Image uid {registration['uid']} already exists."
-            self._logger.error(msg)
-            raise FileExistsError(msg)
-        self._save()
+    def add_many(self, registrations: list) -> BatchResult:
+        """Adds a batch of image registrations to the registry in a single load and write.
+
+        Registrations whose uid is already registered are not added, nor are any of the copies of
+        a uid that appears more than once in the batch. Both are reported as failures.
+
+        Args:
+            registrations (list): List of image registrations in dictionary format.
+
+        Returns:
+            BatchResult reporting the uids added and those that failed.
+        """
+        result = BatchResult()
+        if len(registrations) == 0:
+            return result
+
+        with self._lock():
+            batch = pd.DataFrame(data=registrations)
+            repeated = batch["uid"].duplicated(keep=False)
+            for uid in batch.loc[repeated, "uid"].unique():
+                msg = f"Image uid {uid} appears more than once in the batch."
+                self._logger.error(msg)
+                result.failed[uid] = FileExistsError(msg)
+            duplicated = ~repeated & self._registered(uids=batch["uid"])
+            for uid in batch.loc[duplicated, "uid"]:
+                msg = f"Image uid {uid} already exists."
+                self._logger.error(msg)
+                result.failed[uid] = FileExistsError(msg)
+            duplicated |= repeated
+
+            batch = self._check_batch(batch=batch[~duplicated], result=result)
+            if not batch.empty:
+                self._append(batch)
+                self._save()
+        result.succeeded = list(batch["uid"])
+        return result
 
     def get(self, uid: str) -> dict:
         """Gets a registration for a image from the registry.
@@ -60,20 +136,135 @@ class ImageRegistry(Registry):
         Args:
             image _uid (str): Image unique id.
         """
+        if self._signature == () and self._uses_uid_index():
+            registration = self._get_from_uid_index(uid)
+            if registration is not None:
+                return registration
+        return self._get_loaded(uid)
+
+    @read_locked
+    def _get_loaded(self, uid: str) -> dict:
+        """Gets a registration from the loaded registry."""
         self._load()
-        if self._exists(uid):
-            return self._registry[self._registry["uid"] == uid].to_dict(orient="records")[
-                0
-            ]  # Actually returns a list
-        else:
+        try:
+            position = self._index[uid]
+        except KeyError:
             msg = f"The uid, {uid} does not exist."
             self._logger.error(msg)
             raise FileNotFoundError(msg)
+        registration = self._row(self._registry, position)
+        registration.pop("id", None)
+        return registration
+
+    @read_locked
+    def get_many(self, uids: list) -> BatchResult:
+        """Gets the registrations for a batch of images under a single read of the registry.
 
+        Args:
+            uids (list): List of image uids.
+
+        Returns:
+            BatchResult with the registrations in results, aligned with succeeded.
+        """
+        result = BatchResult()
+        for uid in uids:
+            try:
+                registration = self.get(uid=uid)
+            except FileNotFoundError as e:
+                result.failed[uid] = e
+            else:
+                result.succeeded.append(uid)
+                result.results.append(registration)
+        return result
+
+    @read_locked
     def get_uids(self) -> list:
         """Returns a list of image uids"""
         self._load()
-        return self._registry["uid"].values
+        # An empty registry has no columns.
+        return self._registry.get("uid", pd.Series(dtype=object)).values
+
+    @read_locked
+    def to_ids(self, uids: list) -> np.ndarray:
+        """Maps image uids to their integer ids.
+
+        Args:
+            uids (list): Array-like of image uids.
+
+        Returns:
+            Array of int32 ids, aligned with uids.
+        """
+        index, ids, _ = self._get_id_map()
+        positions = index.get_indexer(uids)
+        if (positions < 0).any():
+            missing = np.asarray(uids, dtype=object)[positions < 0]
+            msg = f"{len(missing)} uids do not exist, e.g. {missing[0]}."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        return ids[positions]
+
+    @read_locked
+    def to_uids(self, ids: list) -> np.ndarray:
+        """Maps integer image ids to their uids.
+
+        Args:
+            ids (list): Array-like of integer image ids.
+
+        Returns:
+            Array of uids, aligned with ids.
+        """
+        _, _, uids_by_id = self._get_id_map()
+        ids = np.asarray(ids, dtype=np.int64)
+        valid = (ids >= 0) & (ids < len(uids_by_id))
+        uids = np.full(len(ids), None, dtype=object)
+        uids[valid] = uids_by_id[ids[valid]]
+        unknown = pd.isnull(uids)
+        if unknown.any():
+            missing = ids[unknown]
+            msg = f"{len(missing)} ids do not exist, e.g. {missing[0]}."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        return uids
+
+    def by_series(self, series_uid: str) -> np.ndarray:
+        """Returns the uids of the images in a series."""
+        return self.query(series_uid=series_uid)
+
+    def by_study(self, study_uid: str) -> np.ndarray:
+        """Returns the uids of the images in a study."""
+        return self.query(study_uid=study_uid)
+
+    def by_subject(self, subject_id: str) -> np.ndarray:
+        """Returns the uids of the images for a subject."""
+        return self.query(subject_id=subject_id)
+
+    def by_casetype(self, casetype: str) -> np.ndarray:
+        """Returns the uids of the images of a casetype, i.e. 'calc' or 'mass'."""
+        return self.query(casetype=casetype)
+
+    def by_fileset(self, fileset: str) -> np.ndarray:
+        """Returns the uids of the images in a fileset, i.e. 'train' or 'test'."""
+        return self.query(fileset=fileset)
+
+    @read_locked
+    def query(self, **criteria) -> np.ndarray:
+        """Returns the uids of the images matching all criteria, in registry order.
+
+        Lookups use secondary indexes on the criteria columns, which are built once per load.
+
+        Args:
+            **criteria: Column values to match, e.g. casetype="calc", fileset="train".
+        """
+        registry = self._indexed()
+        if registry.empty:
+            return np.array([], dtype=object)
+        positions = None
+        for column, value in criteria.items():
+            matches = self._get_secondary(column).get(value, np.array([], dtype=np.intp))
+            positions = matches if positions is None else np.intersect1d(positions, matches)
+        if positions is None:
+            return registry["uid"].values
+        return registry["uid"].values[np.sort(positions)]
 
     def update(self, registration: dict) -> None:
         """Updates the registration in the registry
@@ -81,25 +272,830 @@ class ImageRegistry(Registry):
         Args:
             registration (dict): Image registration
         """
+        result = self.update_many(registrations=[registration])
+        self._raise_on_failure(result)
+
+    def update_many(self, registrations: list) -> BatchResult:
+        """Updates a batch of existing registrations in a single load and write.
+
+        Registrations whose uid is not registered are not updated and are reported as failures.
+
+        Args:
+            registrations (list): List of image registrations in dictionary format.
+
+        Returns:
+            BatchResult reporting the uids updated and those that failed.
+        """
+        result = BatchResult()
+        if len(registrations) == 0:
+            return result
 
-        self.remove(uid=registration["uid"])
-        self.add(registration=registration)
+        with self._lock():
+            batch = pd.DataFrame(data=registrations).drop_duplicates(subset="uid", keep="last")
+            missing = ~self._registered(uids=batch["uid"])
+            for uid in batch.loc[missing, "uid"]:
+                msg = f"Image registration for {uid} not found."
+                self._logger.error(msg)
+                result.failed[uid] = FileNotFoundError(msg)
+
+            batch = self._check_batch(batch=batch[~missing], result=result)
+            if not batch.empty:
+                self._replace(batch)
+                self._save()
+        result.succeeded = list(batch["uid"])
+        return result
 
     def remove(self, uid: str) -> None:
         """Removes a Image registration from the registry."""
+        result = self.remove_many(uids=[uid])
+        self._raise_on_failure(result)
+
+    def remove_many(self, uids: list) -> BatchResult:
+        """Removes a batch of image registrations in a single load and write.
+
+        Args:
+            uids (list): List of image uids.
+
+        Returns:
+            BatchResult reporting the uids removed and those that were not found.
+        """
+        result = BatchResult()
+        with self._lock():
+            for uid in uids:
+                if uid in self._index:
+                    result.succeeded.append(uid)
+                else:
+                    msg = f"Image registration for {uid} not found."
+                    self._logger.error(msg)
+                    result.failed[uid] = FileNotFoundError(msg)
+
+            if len(result.succeeded) > 0:
+                self._drop(uids=result.succeeded)
+                self._save()
+        return result
+
+    @read_locked
+    def _exists(self, uid: str) -> bool:
+        """Checks existence of the image in the registry."""
         self._load()
-        if self._exists(uid=uid):
-            self._registry = self._registry[self._registry["uid"] != uid]
+        return uid in self._index
+
+    def _append(self, batch: pd.DataFrame, ids: np.ndarray = None) -> None:
+        """Appends new registrations to the registry and indexes them.
+
+        Args:
+            batch (pd.DataFrame): Registrations to append.
+            ids (np.ndarray): Ids for the registrations. New ids are assigned if None.
+        """
+        batch = self._assign_ids(batch, ids=ids)
+        batch.index += len(self._registry)
+        if self._registry.empty:
+            self._registry = batch
         else:
-            msg = f"Image registration for {uid} not found."
+            self._registry = pd.concat([self._registry, batch], axis=0)
+        self._registry = self._apply_schema(self._registry)
+        self._index.update(zip(batch["uid"].values, batch.index))
+        self._secondary = {}
+
+    def _drop(self, uids: list) -> None:
+        """Drops registrations from the registry and rebuilds the index."""
+        positions = [self._index[uid] for uid in uids]
+        self._registry = self._registry.drop(index=positions)
+        self._build_index()
+
+    def _replace(self, batch: pd.DataFrame) -> None:
+        """Replaces existing registrations with those in the batch, keeping their ids."""
+        ids = self._get_ids(uids=batch["uid"])
+        self._drop(uids=batch["uid"])
+        self._append(batch, ids=ids)
+
+    def _assign_ids(self, batch: pd.DataFrame, ids: np.ndarray = None) -> pd.DataFrame:
+        """Returns the batch with ids, assigning the next available ids if none are given."""
+        batch = batch.reset_index(drop=True)
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + len(batch))
+        batch["id"] = np.asarray(ids, dtype=np.int32)
+        if len(batch) > 0:
+            self._next_id = max(self._next_id, int(batch["id"].max()) + 1)
+        return batch
+
+    def _get_ids(self, uids: list) -> np.ndarray:
+        """Returns the ids of registered uids."""
+        return self._registry["id"].values[[self._index[uid] for uid in uids]]
+
+    def _registered(self, uids: pd.Series) -> pd.Series:
+        """Returns a boolean series indicating which uids are registered."""
+        return uids.isin(self._index.keys())
+
+    def _check_batch(self, batch: pd.DataFrame, result: BatchResult) -> pd.DataFrame:
+        """Returns the registrations in the batch that can be applied. Override to validate.
+
+        Args:
+            batch (pd.DataFrame): Registrations to add or update.
+            result (BatchResult): Result to which rejected registrations are reported as failed.
+        """
+        return batch
+
+    def _get_id_map(self) -> tuple:
+        """Returns the uid index, the ids aligned with it, and the uids indexed by id.
+
+        The maps are cached with the secondary indexes, so they are rebuilt on the same events.
+        """
+        key = "__id_map__"
+        if key not in self._secondary:
+            registry = self._indexed()
+            if registry.empty:
+                uids, ids = np.array([], dtype=object), np.array([], dtype=np.int32)
+            else:
+                uids, ids = registry["uid"].values, registry["id"].values.astype(np.int32)
+            uids_by_id = np.full(int(ids.max()) + 1 if len(ids) else 0, None, dtype=object)
+            uids_by_id[ids] = uids
+            self._secondary[key] = (pd.Index(uids), ids, uids_by_id)
+        return self._secondary[key]
+
+    def _get_secondary(self, column: str) -> dict:
+        """Returns the secondary index for a column, building it if necessary."""
+        if column not in self._secondary:
+            registry = self._indexed()
+            if column not in registry.columns:
+                msg = f"Column {column} is not in the registry."
+                self._logger.error(msg)
+                raise KeyError(msg)
+            self._secondary[column] = registry.groupby(column, sort=False, observed=True).indices
+        return self._secondary[column]
+
+    def _indexed(self) -> pd.DataFrame:
+        """Returns the registry frame whose row positions the secondary indexes refer to."""
+        return self.registry
+
+    def _apply_schema(self, registry: pd.DataFrame, schema: dict = None) -> pd.DataFrame:
+        """Converts registry columns to the compact types declared in the schema."""
+        registry = registry.copy(deep=False)
+        schema = self._schema if schema is None else schema
+        for column, dtype in schema.items():
+            if column not in registry.columns:
+                continue
+            if dtype == "category":
+                registry[column] = registry[column].astype("category")
+            elif dtype in ("integer", "signed", "unsigned", "float"):
+                registry[column] = pd.to_numeric(registry[column], downcast=dtype)
+            else:
+                registry[column] = registry[column].astype(dtype)
+        return registry
+
+    @staticmethod
+    def _row(registry: pd.DataFrame, position: int) -> dict:
+        """Returns the row at a position as a dictionary of Python values."""
+        row = {}
+        for column in registry.columns:
+            value = registry[column].values[position]
+            row[column] = value.item() if isinstance(value, np.generic) else value
+        return row
+
+    def _copy_to(self, registry: Registry) -> None:
+        """Writes the registry to another, empty registry, with the next id to be assigned."""
+        registry._next_id = self._next_id
+        super()._copy_to(registry)
+
+    def _save(self) -> None:
+        """Saves the next id, then the registry, so the saved next id is never behind it."""
+        self._write_next_id()
+        super()._save()
+
+    def _write_next_id(self) -> None:
+        """Writes the next id to be assigned to its sidecar."""
+        os.makedirs(os.path.dirname(self._next_id_filepath), exist_ok=True)
+        with open(self._next_id_filepath + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"next_id": self._next_id}, file)
+        os.replace(self._next_id_filepath + ".tmp", self._next_id_filepath)
+
+    def _read_next_id(self) -> int:
+        """Returns the next id saved with the registry, or 0 if none was saved."""
+        try:
+            with open(self._next_id_filepath, encoding="utf-8") as file:
+                return int(json.load(file)["next_id"])
+        except FileNotFoundError:
+            return 0
+
+    def _write(self) -> None:
+        """Writes the registry, and its uid index if the format supports one."""
+        super()._write()
+        if self._uses_uid_index():
+            self._write_uid_index()
+
+    def _uses_uid_index(self) -> bool:
+        """Returns True if the registry is a CSV file, whose rows can be located by offset."""
+        return self._uid_indexed and self._filepath.lower().endswith(".csv")
+
+    def _write_uid_index(self) -> None:
+        """Writes the sorted uid index and its metadata next to the registry file."""
+        data = np.fromfile(self._filepath, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord("\n")) + 1
+        # Rows that span lines (e.g. quoted newlines) can't be located by line, so no index.
+        if len(ends) != len(self._registry) + 1:
+            self._remove_uid_index()
+            return
+        starts = np.concatenate([[0], ends[:-1]])
+        keys = np.char.encode(self._registry["uid"].values.astype(str), "utf-8")
+        order = np.argsort(keys, kind="stable")
+        index = np.empty(
+            len(keys), dtype=[("uid", keys.dtype), ("offset", "<i8"), ("length", "<i4")]
+        )
+        index["uid"] = keys[order]
+        index["offset"] = starts[1:][order]
+        index["length"] = (ends - starts)[1:][order]
+        metadata = {
+            "signature": list(self._get_signature()),
+            "columns": list(self._registry.columns),
+            "dtypes": self._get_read_dtypes(),
+        }
+        # Sidecars are replaced atomically; the metadata last, as it validates the index.
+        with open(self._uid_index_filepath + ".tmp", "wb") as file:
+            np.save(file, index)
+        os.replace(self._uid_index_filepath + ".tmp", self._uid_index_filepath)
+        with open(self._uid_index_metapath + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(metadata, file)
+        os.replace(self._uid_index_metapath + ".tmp", self._uid_index_metapath)
+        self._uid_index = None
+
+    def _get_read_dtypes(self) -> dict:
+        """Returns the dtype each column is read with when the registry file is loaded.
+
+        Numeric and boolean columns are read back as written. Text columns may be read as numbers
+        or booleans (e.g. dates as YYYYMMDD), so their dtypes are taken from the file as read.
+        """
+        dtypes = {}
+        text = []
+        for column, dtype in self._registry.dtypes.items():
+            dtype = dtype.categories.dtype if isinstance(dtype, pd.CategoricalDtype) else dtype
+            if dtype.kind in "biuf":
+                dtypes[column] = str(dtype)
+            else:
+                text.append(column)
+        if len(text) > 0:
+            read = self._io.read(self._filepath, index_col=None, usecols=text).dtypes
+            for column in text:
+                dtypes[column] = str(read[column]) if read[column].kind in "biuf" else "object"
+        return dtypes
+
+    def _remove_uid_index(self) -> None:
+        """Removes the uid index sidecars, if they exist."""
+        for filepath in (self._uid_index_metapath, self._uid_index_filepath):
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+        self._uid_index = None
+
+    def _read_uid_index(self) -> Union[tuple, None]:
+        """Returns the memory-mapped uid index and its metadata, or None if missing or stale."""
+        signature = self._get_signature()
+        if self._uid_index is None or self._uid_index[1]["signature"] != list(signature or []):
+            self._uid_index = None
+            try:
+                with open(self._uid_index_metapath, encoding="utf-8") as file:
+                    metadata = json.load(file)
+                if signature is None or metadata["signature"] != list(signature):
+                    return None
+                index = np.load(self._uid_index_filepath, mmap_mode="r")
+            except FileNotFoundError:
+                return None
+            self._uid_index = (index, metadata)
+        return self._uid_index
+
+    def _get_from_uid_index(self, uid: str) -> Union[dict, None]:
+        """Reads a registration from the file via the uid index without loading the registry.
+
+        Returns:
+            The registration, or None if no valid index exists.
+        """
+        sidecar = self._read_uid_index()
+        if sidecar is None:
+            return None
+        index, metadata = sidecar
+        uids = index["uid"]
+        key = uid.encode("utf-8")
+        position = np.searchsorted(uids, key) if len(key) <= uids.itemsize else len(uids)
+        if position == len(uids) or uids[position] != key:
+            msg = f"The uid, {uid} does not exist."
             self._logger.error(msg)
             raise FileNotFoundError(msg)
-        self._save()
+        with open(self._filepath, "rb") as file:
+            file.seek(int(index["offset"][position]))
+            line = file.read(int(index["length"][position]))
+        values = next(csv.reader([line.decode("utf-8")]))
+        registration = {}
+        for column, value in zip(metadata["columns"], values):
+            registration[column] = self._parse(value, metadata["dtypes"][column])
+        registration.pop("id", None)
+        return registration
 
-    def _exists(self, uid: str) -> bool:
-        """Checks existence of the image in the registry."""
-        self._load()
+    @staticmethod
+    def _parse(value: str, dtype: str) -> Any:
+        """Parses a CSV field to the Python type pandas would read it as, given the column dtype."""
+        # Empty fields are read as NaN, as pandas reads them.
+        if value == "":
+            return np.nan
+        if dtype.startswith(("int", "uint")):
+            return int(value)
+        if dtype.startswith("float"):
+            return float(value)
+        if dtype == "bool":
+            return value == "True"
+        return value
+
+    def _build_index(self) -> None:
+        """Builds the uid to row position index for the registry."""
+        self._secondary = {}
+        self._registry = self._registry.reset_index(drop=True)
+        if not self._registry.empty and "id" not in self._registry.columns:
+            # Registries created before ids were introduced are assigned ids in row order.
+            self._registry["id"] = np.arange(len(self._registry))
+        # The next id never goes down, so the ids of removed images are not reassigned.
+        self._next_id = max(
+            self._next_id,
+            self._read_next_id(),
+            int(self._registry["id"].max()) + 1 if not self._registry.empty else 0,
+        )
+        self._registry = self._apply_schema(self._registry)
         try:
-            return uid in self._registry["uid"].values
+            uids = self._registry["uid"].values
         except KeyError:
-            return False
+            uids = []
+        self._index = dict(zip(uids, range(len(uids))))
+
+
+# ------------------------------------------------------------------------------------------------ #
+class ParquetImageRegistry(ImageRegistry):
+    """Image registry persisted as a parquet dataset partitioned by casetype and fileset.
+
+    Queries through select read directly from the dataset, pushing the column selection and
+    filters down to pyarrow. Only the selected columns of the matching partitions are read.
+
+    Each write creates a new version of the dataset, and the filepath is a symlink switched to it
+    with a single rename, so readers in other processes never find the registry missing.
+
+    Args:
+        filepath (str): Location of the registry dataset, e.g. registry.parquet
+
+    """
+
+    __partitions = ["casetype", "fileset"]
+    _uid_indexed = False
+
+    def select(self, columns: list = None, **criteria) -> pd.DataFrame:
+        """Reads the selected columns of the registrations matching the criteria.
+
+        Args:
+            columns (list): Columns to read. Defaults to all columns.
+            **criteria: Column values to match, e.g. casetype="calc". A list matches any value.
+        """
+        filters = []
+        for column, value in criteria.items():
+            if isinstance(value, (list, tuple, set)):
+                filters.append((column, "in", list(value)))
+            else:
+                filters.append((column, "=", value))
+        try:
+            return self._io.read(self._filepath, columns=columns, filters=filters or None)
+        except FileNotFoundError:
+            return pd.DataFrame(columns=columns)
+
+    def _write(self) -> None:
+        """Writes the registry as a partitioned parquet dataset."""
+        self._io.write(
+            data=self._registry, filepath=self._filepath, partition_cols=self.__partitions
+        )
+
+    def _get_signature(self) -> Union[tuple, None]:
+        """Returns the (version, mtime, inode) signature of the dataset.
+
+        Each write creates a new version directory, so the version the filepath links to
+        identifies the dataset with a single stat.
+        """
+        version = os.path.realpath(self._filepath)
+        try:
+            stat = os.stat(version)
+        except FileNotFoundError:
+            return None
+        return (version, stat.st_mtime_ns, stat.st_ino)
+
+
+# ------------------------------------------------------------------------------------------------ #
+class NormalizedImageRegistry(ImageRegistry):
+    """Image registry stored as a series table and a per-file table keyed by series.
+
+    Series level passport fields are stored once per series rather than once per file. The file
+    table holds only the uid, series_uid, filename, file_size and id of each image. Registrations
+    are reassembled by joining the file to its series on get. The series table is stored next to the
+    file table with a '_series' suffix, e.g. registry.csv and registry_series.csv.
+
+    Args:
+        filepath (str): Location of the file table.
+
+    """
+
+    _file_columns = ["uid", "series_uid", "filename", "file_size", "id"]
+    # The inherited schema applies to the file table; the series table has its own.
+    _schema = {
+        "id": "int32",
+        "series_uid": "category",
+        "filename": "category",
+        "file_size": "integer",
+    }
+    _series_schema = ImageRegistry._schema
+    _uid_indexed = False
+
+    def __init__(self, filepath: str) -> None:
+        super().__init__(filepath=filepath)
+        stem, ext = os.path.splitext(filepath)
+        self._series_filepath = stem + "_series" + ext
+        self._series = pd.DataFrame()
+        self._series_index = {}
+        self._materialized = None
+
+    @property
+    @read_locked
+    def registry(self) -> pd.DataFrame:
+        """Returns the registry with each file joined to its series."""
+        self._load()
+        if self._materialized is None:
+            if self._registry.empty:
+                self._materialized = self._registry
+            else:
+                self._materialized = self._registry.merge(
+                    self._series, on="series_uid", how="left", sort=False
+                )
+        return self._materialized
+
+    @read_locked
+    def get(self, uid: str) -> dict:
+        """Gets a registration for a image from the registry.
+
+        Args:
+            uid (str): Image unique id.
+        """
+        registration = super().get(uid=uid)
+        position = self._series_index[registration["series_uid"]]
+        series = self._row(self._series, position)
+        series.update(registration)
+        return series
+
+    def _load(self, force: bool = False) -> None:
+        """Loads the series and file tables.
+
+        Args:
+            force (bool): Reload the registry even if the files are unchanged.
+        """
+        if self._rwlock.reading:
+            return
+        signature = self._get_signature()
+        if not force and signature == self._signature:
+            return
+        try:
+            self._series = self._io.read(self._series_filepath, index_col=None)
+        except FileNotFoundError:
+            self._series = pd.DataFrame()
+        super()._load(force=True)
+        self._signature = signature
+
+    def _copy_to(self, registry: Registry) -> None:
+        """Writes the series and file tables to another, empty registry."""
+        with registry._lock():
+            registry._series = self._series
+            super()._copy_to(registry)
+
+    def _write(self) -> None:
+        """Writes the series and file tables."""
+        self._write_atomic(data=self._series, filepath=self._series_filepath)
+        super()._write()
+
+    def _indexed(self) -> pd.DataFrame:
+        """Secondary indexes refer to row positions in the file table."""
+        self._load()
+        return self._registry
+
+    def _get_secondary(self, column: str) -> dict:
+        """Returns the secondary index for a column, mapping series level values to files."""
+        if column in self._file_columns or column in self._secondary:
+            return super()._get_secondary(column)
+        if column not in self._series.columns:
+            msg = f"Column {column} is not in the registry."
+            self._logger.error(msg)
+            raise KeyError(msg)
+        files = super()._get_secondary("series_uid")
+        series_uids = self._series["series_uid"].values
+        empty = np.array([], dtype=np.intp)
+        self._secondary[column] = {
+            value: np.concatenate([empty] + [files.get(series_uids[p], empty) for p in positions])
+            for value, positions in self._series.groupby(
+                column, sort=False, observed=True
+            ).indices.items()
+        }
+        return self._secondary[column]
+
+    def _check_batch(self, batch: pd.DataFrame, result: BatchResult) -> pd.DataFrame:
+        """Rejects registrations whose series level fields conflict with the rest of their series.
+
+        A series' fields are shared by its files, so a registration may only change them if every
+        registered file of the series is in the batch. Registrations of a series that disagree
+        within the batch, or with the series table, are reported as failed.
+        """
+        columns = ["series_uid"] + [c for c in batch.columns if c not in self._file_columns]
+        variants = batch[columns].drop_duplicates()
+        conflicts = set(variants.loc[variants["series_uid"].duplicated(), "series_uid"])
+        uids = set(batch["uid"])
+        files = super()._get_secondary("series_uid") if self._series_index else {}
+        registered = self._registry["uid"].values if self._series_index else None
+        for series in variants.drop_duplicates(subset="series_uid").to_dict(orient="records"):
+            position = self._series_index.get(series["series_uid"])
+            if position is None or series["series_uid"] in conflicts:
+                continue
+            if all(uid in uids for uid in registered[files.get(series["series_uid"], [])]):
+                continue
+            existing = self._row(self._series, position)
+            if not all(self._same(value, existing.get(k)) for k, value in series.items()):
+                conflicts.add(series["series_uid"])
+
+        conflicted = batch["series_uid"].isin(conflicts)
+        for uid, series_uid in batch.loc[conflicted, ["uid", "series_uid"]].values:
+            msg = f"Series fields of image {uid} conflict with those of series {series_uid}."
+            self._logger.error(msg)
+            result.failed[uid] = ValueError(msg)
+        return batch[~conflicted]
+
+    @staticmethod
+    def _same(value: Any, other: Any) -> bool:
+        """Returns True if two field values are equal, treating missing values as equal."""
+        if pd.isna(value) and pd.isna(other):
+            return True
+        return value == other or str(value) == str(other)
+
+    def _append(self, batch: pd.DataFrame, ids: np.ndarray = None) -> None:
+        """Appends new files to the file table and upserts their series into the series table."""
+        files = [column for column in self._file_columns if column != "series_uid"]
+        series = batch.drop(columns=files, errors="ignore").drop_duplicates(
+            subset="series_uid", keep="last"
+        )
+        if self._series.empty:
+            self._series = series
+        else:
+            self._series = pd.concat(
+                [self._series[~self._series["series_uid"].isin(series["series_uid"])], series],
+                axis=0,
+            )
+        self._series = self._apply_schema(self._series.reset_index(drop=True), self._series_schema)
+        self._series_index = dict(zip(self._series["series_uid"].values, range(len(self._series))))
+        self._materialized = None
+        files = [column for column in self._file_columns if column in batch.columns]
+        super()._append(batch[files], ids=ids)
+
+    def _drop(self, uids: list) -> None:
+        """Drops files from the file table, and series left without files from the series table."""
+        positions = [self._index[uid] for uid in uids]
+        self._registry = self._registry.drop(index=positions)
+        self._series = self._series[self._series["series_uid"].isin(self._registry["series_uid"])]
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Builds the uid index for the file table and the series_uid index for the series table."""
+        super()._build_index()
+        self._materialized = None
+        if not self._series.empty:
+            self._series = self._apply_schema(
+                self._series.reset_index(drop=True), self._series_schema
+            )
+        self._series_index = dict(zip(self._series.get("series_uid", []), range(len(self._series))))
+
+    def _get_signature(self) -> tuple:
+        """Returns the (mtime, size) signatures of the file and series tables."""
+        series = self._series_filepath
+        try:
+            stat = os.stat(series)
+            series = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            series = None
+        return (super()._get_signature(), series)
+
+
+# ------------------------------------------------------------------------------------------------ #
+class JournaledImageRegistry(ImageRegistry):
+    """Image registry that records mutations in an append-only journal.
+
+    Adds, updates and removes append small JSON records to a journal file next to the registry,
+    rather than rewriting the registry. Removes are recorded as tombstones. Reads replay the journal
+    over the last snapshot, and only the records appended since the last read are replayed. Once
+    the journal exceeds the size limit, it is compacted into the snapshot and truncated.
+
+    A parquet filepath gives a columnar snapshot.
+
+    Args:
+        filepath (str): Location of the registry snapshot.
+        journal_limit (int): Journal size in bytes above which the journal is compacted.
+
+    """
+
+    _uid_indexed = False
+
+    def __init__(self, filepath: str, journal_limit: int = 4 * 1024 * 1024) -> None:
+        super().__init__(filepath=filepath)
+        self._journal = os.path.splitext(filepath)[0] + ".journal"
+        self._journal_limit = journal_limit
+        self._journal_offset = 0
+        # Registrations added or updated since the snapshot. Tombstones are stored as None.
+        self._overlay = {}
+        self._pending = []
+        self._materialized = None
+
+    @property
+    @read_locked
+    def registry(self) -> pd.DataFrame:
+        """Returns the snapshot with the journal applied."""
+        self._load()
+        if self._materialized is None:
+            frames = [pd.DataFrame([r for r in self._overlay.values() if r is not None])]
+            if not self._registry.empty:
+                base = self._registry[~self._registry["uid"].isin(self._overlay.keys())]
+                frames.insert(0, base)
+            self._materialized = self._apply_schema(
+                pd.concat(frames, axis=0, ignore_index=True)
+            )
+        return self._materialized
+
+    @read_locked
+    def get(self, uid: str) -> dict:
+        """Gets a registration for a image from the registry.
+
+        Args:
+            uid (str): Image unique id.
+        """
+        self._load()
+        registration = self._overlay.get(uid)
+        if registration is not None:
+            registration = dict(registration)
+            registration.pop("id", None)
+            return registration
+        return super().get(uid=uid)
+
+    @read_locked
+    def get_uids(self) -> list:
+        """Returns a list of image uids"""
+        self._load()
+        return np.array(list(self._index.keys()), dtype=object)
+
+    def compact(self) -> None:
+        """Folds the journal into the snapshot and truncates the journal."""
+        with self._lock():
+            self._registry = self.registry
+            super()._save()
+            open(self._journal, "w").close()
+            self._journal_offset = 0
+            self._signature = self._get_signature()
+            self._build_index()
+
+    def clone(self, filepath: str) -> Registry:
+        """Returns a journaled registry with the same journal limit for the snapshot at filepath."""
+        return self.__class__(filepath=filepath, journal_limit=self._journal_limit)
+
+    def _copy_to(self, registry: Registry) -> None:
+        """Writes the snapshot with the journal applied to another registry, with no journal."""
+        with registry._lock():
+            registry._registry = self.registry
+            registry._next_id = self._next_id
+            registry._build_index()
+            super(JournaledImageRegistry, registry)._save()
+
+    def _load(self, force: bool = False) -> None:
+        """Loads the snapshot and replays the journal over it.
+
+        If only the journal has grown since the last load, only the new records are replayed.
+
+        Args:
+            force (bool): Reload the snapshot and the whole journal.
+        """
+        if self._rwlock.reading:
+            return
+        signature = self._get_signature()
+        if not force and signature == self._signature:
+            return
+        if (
+            force
+            or not self._signature
+            or signature[0] != self._signature[0]
+            or signature[1] is None
+            or signature[1][1] < self._journal_offset
+        ):
+            # The snapshot was rewritten or the journal truncated. _build_index replays the journal.
+            super()._load(force=True)
+        else:
+            self._replay()
+        self._signature = signature
+
+    def _save(self) -> None:
+        """Appends pending records to the journal, compacting it if it exceeds the size limit."""
+        if len(self._pending) > 0:
+            os.makedirs(os.path.dirname(self._journal), exist_ok=True)
+            with open(self._journal, "a", encoding="utf-8") as journal:
+                journal.write("".join(self._pending))
+                self._journal_offset = journal.tell()
+            self._pending = []
+        self._signature = self._get_signature()
+        if self._journal_offset > self._journal_limit:
+            self.compact()
+
+    def _append(self, batch: pd.DataFrame, ids: np.ndarray = None) -> None:
+        """Journals the batch of registrations as put records."""
+        batch = self._assign_ids(batch, ids=ids)
+        for registration in batch.to_dict(orient="records"):
+            self._put(registration)
+
+    def _replace(self, batch: pd.DataFrame) -> None:
+        """Journals the batch of registrations as put records, replacing existing registrations."""
+        self._append(batch, ids=self._get_ids(uids=batch["uid"]))
+
+    def _registered(self, uids: pd.Series) -> pd.Series:
+        """Looks up each uid in the index, so the cost scales with the batch, not the registry."""
+        return uids.map(self._index.__contains__).astype(bool)
+
+    def _get_ids(self, uids: list) -> np.ndarray:
+        """Returns the ids of registered uids from the journal or the snapshot."""
+        ids = []
+        for uid in uids:
+            registration = self._overlay.get(uid)
+            if registration is None:
+                ids.append(self._registry["id"].values[self._index[uid]])
+            else:
+                ids.append(registration["id"])
+        return np.array(ids, dtype=np.int32)
+
+    def _drop(self, uids: list) -> None:
+        """Journals tombstones for the registrations."""
+        for uid in uids:
+            self._delete(uid)
+
+    def _put(self, registration: dict, journal: bool = True) -> None:
+        """Applies a put record to the overlay, optionally journaling it."""
+        uid = registration["uid"]
+        self._overlay[uid] = registration
+        self._index.setdefault(uid, None)
+        self._next_id = max(self._next_id, int(registration.get("id", -1)) + 1)
+        self._materialized = None
+        self._secondary = {}
+        if journal:
+            self._journal_record({"op": "put", "uid": uid, "registration": registration})
+
+    def _delete(self, uid: str, journal: bool = True) -> None:
+        """Applies a tombstone to the overlay, optionally journaling it."""
+        self._overlay[uid] = None
+        self._index.pop(uid, None)
+        self._materialized = None
+        self._secondary = {}
+        if journal:
+            self._journal_record({"op": "delete", "uid": uid})
+
+    def _journal_record(self, record: dict) -> None:
+        """Serializes a record to a pending journal line."""
+        self._pending.append(json.dumps(record, default=self._to_json) + "\n")
+
+    def _replay(self) -> None:
+        """Applies complete journal records appended since the last replay."""
+        try:
+            with open(self._journal, "rb") as journal:
+                journal.seek(self._journal_offset)
+                lines = journal.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return
+        for line in lines:
+            if not line.endswith(b"\n"):
+                # A record still being written. It will be replayed on the next load.
+                break
+            self._journal_offset += len(line)
+            record = json.loads(line)
+            if record["op"] == "put":
+                self._put(record["registration"], journal=False)
+            else:
+                self._delete(record["uid"], journal=False)
+
+    def _build_index(self) -> None:
+        """Indexes the snapshot then replays the whole journal over it."""
+        super()._build_index()
+        self._overlay = {}
+        self._materialized = None
+        self._journal_offset = 0
+        self._replay()
+
+    def _get_signature(self) -> tuple:
+        """Returns the (mtime, size) signatures of the snapshot and the journal."""
+        try:
+            stat = os.stat(self._journal)
+            journal = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            journal = None
+        return (super()._get_signature(), journal)
+
+    @staticmethod
+    def _to_json(value: Any) -> Any:
+        """Converts numpy scalars and other non-JSON types for serialization."""
+        if isinstance(value, np.generic):
+            return value.item()
+        return str(value)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /bcd/data/repo/sqlite.py                                                            #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 01:57:33 am                                                #
+# Modified   : Sunday October 18th 2026 03:24:34 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+"""SQLite Image Registry Module"""
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from bcd.data.repo.base import BatchResult, Registry
+from bcd.data.study.image import DICOMPassport
+
+
+# ------------------------------------------------------------------------------------------------ #
+class SQLiteImageRegistry(Registry):
+    """Registry for DICOM images backed by a SQLite database.
+
+    Registrations are stored in a table keyed by uid, with indexes on series_uid, subject_id,
+    casetype and fileset, plus study_uid and id for lookups. The database runs in WAL mode so readers
+    don't block the writer, and batch operations run in a single transaction. Each thread gets its
+    own connection. As in the in-memory registries, each image is assigned a dense integer id,
+    kept on update. The next id is stored in a metadata table, so ids of removed images are not
+    reassigned.
+
+    Args:
+        filepath (str): Location of the SQLite database file.
+        timeout (float): Seconds to wait for a lock held by another connection.
+
+    """
+
+    __table = "registry"
+    __metadata = "metadata"
+    __indexes = ["series_uid", "study_uid", "subject_id", "casetype", "fileset", "id"]
+    __types = {"int": "INTEGER", "float": "REAL"}
+    # SQLite limits the number of host parameters in a statement.
+    __chunksize = 500
+
+    def __init__(self, filepath: str, timeout: float = 30.0) -> None:
+        super().__init__(filepath=filepath)
+        self._timeout = timeout
+        self._columns = [f.name for f in fields(DICOMPassport)] + ["id"]
+        self._local = threading.local()
+
+    @property
+    def registry(self) -> pd.DataFrame:
+        """Returns the registry."""
+        return pd.read_sql_query(f"SELECT * FROM {self.__table} ORDER BY id", self._connect())
+
+    @property
+    def count(self) -> int:
+        """Returns number of registered images'."""
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.__table}").fetchone()[0]
+
+    def add(self, registration: dict) -> None:
+        """Adds a image registration to the registry."""
+        result = self.add_many(registrations=[registration])
+        self._raise_on_failure(result)
+
+    def add_many(self, registrations: list) -> BatchResult:
+        """Adds a batch of image registrations to the registry in a single transaction.
+
+        Registrations whose uid is already registered are not added, nor are any of the copies of
+        a uid that appears more than once in the batch. Both are reported as failures.
+
+        Args:
+            registrations (list): List of image registrations in dictionary format.
+
+        Returns:
+            BatchResult reporting the uids added and those that failed.
+        """
+        result = BatchResult()
+        with self._transaction() as connection:
+            existing = self._existing(connection, [r["uid"] for r in registrations])
+            # Databases created before the next id was stored fall back on the highest id.
+            next_id = connection.execute(
+                "SELECT MAX("
+                f"(SELECT COALESCE(MAX(value), 0) FROM {self.__metadata} WHERE key = 'next_id'), "
+                f"(SELECT COALESCE(MAX(id), -1) + 1 FROM {self.__table}))"
+            ).fetchone()[0]
+            counts = Counter(registration["uid"] for registration in registrations)
+            rows = []
+            for registration in registrations:
+                uid = registration["uid"]
+                if counts[uid] > 1:
+                    msg = f"Image uid {uid} appears more than once in the batch."
+                    self._logger.error(msg)
+                    result.failed[uid] = FileExistsError(msg)
+                elif uid in existing:
+                    msg = f"Image uid {uid} already exists."
+                    self._logger.error(msg)
+                    result.failed[uid] = FileExistsError(msg)
+                else:
+                    existing[uid] = next_id
+                    rows.append(self._to_row(dict(registration, id=next_id)))
+                    result.succeeded.append(uid)
+                    next_id += 1
+            connection.executemany(self._insert("INSERT"), rows)
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.__metadata} (key, value) VALUES ('next_id', ?)",
+                (next_id,),
+            )
+        return result
+
+    def get(self, uid: str) -> dict:
+        """Gets a registration for a image from the registry.
+
+        Args:
+            uid (str): Image unique id.
+        """
+        row = (
+            self._connect()
+            .execute(f"SELECT * FROM {self.__table} WHERE uid = ?", (uid,))
+            .fetchone()
+        )
+        if row is None:
+            msg = f"The uid, {uid} does not exist."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        registration = dict(row)
+        registration.pop("id")
+        return registration
+
+    def get_many(self, uids: list) -> BatchResult:
+        """Gets the registrations for a batch of images, querying in chunks.
+
+        Args:
+            uids (list): List of image uids.
+
+        Returns:
+            BatchResult with the registrations in results, aligned with succeeded.
+        """
+        registrations = {}
+        for chunk in self._chunks(list(uids)):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT * FROM {self.__table} WHERE uid IN ({placeholders})", chunk
+            )
+            for row in rows:
+                registration = dict(row)
+                registration.pop("id")
+                registrations[registration["uid"]] = registration
+        result = BatchResult()
+        for uid in uids:
+            if uid in registrations:
+                result.succeeded.append(uid)
+                result.results.append(registrations[uid])
+            else:
+                msg = f"The uid, {uid} does not exist."
+                self._logger.error(msg)
+                result.failed[uid] = FileNotFoundError(msg)
+        return result
+
+    def get_uids(self) -> list:
+        """Returns a list of image uids"""
+        rows = self._connect().execute(f"SELECT uid FROM {self.__table} ORDER BY id")
+        return np.array([row[0] for row in rows], dtype=object)
+
+    def to_ids(self, uids: list) -> np.ndarray:
+        """Maps image uids to their integer ids.
+
+        Args:
+            uids (list): Array-like of image uids.
+
+        Returns:
+            Array of int32 ids, aligned with uids.
+        """
+        existing = self._existing(self._connect(), uids)
+        missing = [uid for uid in uids if uid not in existing]
+        if missing:
+            msg = f"{len(missing)} uids do not exist, e.g. {missing[0]}."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        return np.array([existing[uid] for uid in uids], dtype=np.int32)
+
+    def to_uids(self, ids: list) -> np.ndarray:
+        """Maps integer image ids to their uids.
+
+        Args:
+            ids (list): Array-like of integer image ids.
+
+        Returns:
+            Array of uids, aligned with ids.
+        """
+        ids = [int(image_id) for image_id in ids]
+        uids = {}
+        for chunk in self._chunks(ids):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT id, uid FROM {self.__table} WHERE id IN ({placeholders})", chunk
+            )
+            uids.update((row[0], row[1]) for row in rows)
+        missing = [image_id for image_id in ids if image_id not in uids]
+        if missing:
+            msg = f"{len(missing)} ids do not exist, e.g. {missing[0]}."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        return np.array([uids[image_id] for image_id in ids], dtype=object)
+
+    def by_series(self, series_uid: str) -> np.ndarray:
+        """Returns the uids of the images in a series."""
+        return self.query(series_uid=series_uid)
+
+    def by_study(self, study_uid: str) -> np.ndarray:
+        """Returns the uids of the images in a study."""
+        return self.query(study_uid=study_uid)
+
+    def by_subject(self, subject_id: str) -> np.ndarray:
+        """Returns the uids of the images for a subject."""
+        return self.query(subject_id=subject_id)
+
+    def by_casetype(self, casetype: str) -> np.ndarray:
+        """Returns the uids of the images of a casetype, i.e. 'calc' or 'mass'."""
+        return self.query(casetype=casetype)
+
+    def by_fileset(self, fileset: str) -> np.ndarray:
+        """Returns the uids of the images in a fileset, i.e. 'train' or 'test'."""
+        return self.query(fileset=fileset)
+
+    def query(self, **criteria) -> np.ndarray:
+        """Returns the uids of the images matching all criteria, in registration order.
+
+        Args:
+            **criteria: Column values to match, e.g. casetype="calc", fileset="train".
+        """
+        for column in criteria:
+            if column not in self._columns:
+                msg = f"Column {column} is not in the registry."
+                self._logger.error(msg)
+                raise KeyError(msg)
+        where = " AND ".join(f"{column} = ?" for column in criteria)
+        statement = f"SELECT uid FROM {self.__table}"
+        if where:
+            statement += f" WHERE {where}"
+        rows = self._connect().execute(statement + " ORDER BY id", list(criteria.values()))
+        return np.array([row[0] for row in rows], dtype=object)
+
+    def update(self, registration: dict) -> None:
+        """Updates the registration in the registry
+
+        Args:
+            registration (dict): Image registration
+        """
+        result = self.update_many(registrations=[registration])
+        self._raise_on_failure(result)
+
+    def update_many(self, registrations: list) -> BatchResult:
+        """Updates a batch of existing registrations in a single transaction.
+
+        Args:
+            registrations (list): List of image registrations in dictionary format.
+
+        Returns:
+            BatchResult reporting the uids updated and those that failed.
+        """
+        result = BatchResult()
+        with self._transaction() as connection:
+            existing = self._existing(connection, [r["uid"] for r in registrations])
+            rows = []
+            for registration in registrations:
+                uid = registration["uid"]
+                if uid in existing:
+                    rows.append(self._to_row(dict(registration, id=existing[uid])))
+                    result.succeeded.append(uid)
+                else:
+                    msg = f"Image registration for {uid} not found."
+                    self._logger.error(msg)
+                    result.failed[uid] = FileNotFoundError(msg)
+            connection.executemany(self._insert("REPLACE"), rows)
+        return result
+
+    def remove(self, uid: str) -> None:
+        """Removes a Image registration from the registry."""
+        result = self.remove_many(uids=[uid])
+        self._raise_on_failure(result)
+
+    def remove_many(self, uids: list) -> BatchResult:
+        """Removes a batch of image registrations in a single transaction.
+
+        Args:
+            uids (list): List of image uids.
+
+        Returns:
+            BatchResult reporting the uids removed and those that were not found.
+        """
+        result = BatchResult()
+        with self._transaction() as connection:
+            existing = self._existing(connection, uids)
+            for uid in uids:
+                if uid in existing:
+                    result.succeeded.append(uid)
+                else:
+                    msg = f"Image registration for {uid} not found."
+                    self._logger.error(msg)
+                    result.failed[uid] = FileNotFoundError(msg)
+            connection.executemany(
+                f"DELETE FROM {self.__table} WHERE uid = ?", [(uid,) for uid in result.succeeded]
+            )
+        return result
+
+    def close(self) -> None:
+        """Closes the connection for the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def clone(self, filepath: str) -> Registry:
+        """Returns a SQLite registry with the same timeout for the database at filepath."""
+        return self.__class__(filepath=filepath, timeout=self._timeout)
+
+    def _copy_to(self, registry: Registry) -> None:
+        """Copies the database with the SQLite backup API, which reads a consistent snapshot."""
+        self._connect().backup(registry._connect())
+
+    def _exists(self, uid: str) -> bool:
+        """Checks existence of the image in the registry."""
+        return uid in self._existing(self._connect(), [uid])
+
+    def _load(self, force: bool = False) -> None:
+        """The database is queried directly; there is nothing to load."""
+
+    def _save(self) -> None:
+        """Transactions are committed as they complete; there is nothing to save."""
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection for the current thread, creating the database if necessary."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self._filepath), exist_ok=True)
+            connection = sqlite3.connect(
+                self._filepath, timeout=self._timeout, isolation_level=None
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._create(connection)
+            self._local.connection = connection
+        return connection
+
+    def _create(self, connection: sqlite3.Connection) -> None:
+        """Creates the registry and metadata tables and the indexes if they don't exist."""
+        # Columns not declared numeric are left untyped, so values round-trip with the type they
+        # were registered with (e.g. number_of_images is read from metadata as an int).
+        columns = ", ".join(
+            f"{f.name} {self.__types.get(f.type, '')}".rstrip()
+            + (" PRIMARY KEY" if f.name == "uid" else "")
+            for f in fields(DICOMPassport)
+        )
+        columns += ", id INTEGER NOT NULL"
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {self.__table} ({columns})")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.__metadata} (key TEXT PRIMARY KEY, value INTEGER)"
+        )
+        for column in self.__indexes:
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.__table}_{column} "
+                f"ON {self.__table} ({column})"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Runs the block in a write transaction, rolling back if an exception is raised."""
+        connection = self._connect()
+        # Acquire the write lock up front so existence checks and writes are consistent.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except Exception as e:
+            connection.execute("ROLLBACK")
+            msg = f"Exception of type {type(e)} occurred.\n{e}"
+            self._logger.error(msg)
+            raise e
+        else:
+            connection.execute("COMMIT")
+
+    def _existing(self, connection: sqlite3.Connection, uids: list) -> dict:
+        """Returns the ids of the subset of uids that are registered, keyed by uid."""
+        existing = {}
+        for chunk in self._chunks(list(uids)):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT uid, id FROM {self.__table} WHERE uid IN ({placeholders})", chunk
+            )
+            existing.update((row[0], row[1]) for row in rows)
+        return existing
+
+    def _chunks(self, values: list) -> Iterator[list]:
+        """Splits values into chunks within SQLite's limit on host parameters."""
+        for i in range(0, len(values), self.__chunksize):
+            yield values[i : i + self.__chunksize]
+
+    def _insert(self, verb: str) -> str:
+        """Formats an INSERT or REPLACE statement for all registry columns."""
+        placeholders = ", ".join("?" * len(self._columns))
+        return (
+            f"{verb} INTO {self.__table} ({', '.join(self._columns)}) VALUES ({placeholders})"
+        )
+
+    def _to_row(self, registration: dict) -> tuple:
+        """Converts a registration to a row of values in column order."""
+        return tuple(self._to_sql(registration.get(column)) for column in self._columns)
+
+    @staticmethod
+    def _to_sql(value: object) -> object:
+        """Converts numpy scalars to Python types that sqlite3 can bind."""
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /bcd/data/repo/store.py                                                             #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:24:40 am                                                #
+# Modified   : Sunday October 18th 2026 03:21:22 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+"""Pixel Store Module"""
+from __future__ import annotations
+import os
+import logging
+import threading
+from typing import Iterator, TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from bcd.service.io.file import IOService, write_versioned
+
+if TYPE_CHECKING:  # pragma: no cover
+    from bcd.data.repo.image import DICOMImageRepo
+
+
+# ------------------------------------------------------------------------------------------------ #
+class PixelStore:
+    """Consolidated store of the decoded pixel arrays of a repository's images.
+
+    Pixel arrays are packed as variable length records into a few large chunk files, rather than
+    read from thousands of DICOM files. Each record starts on a page boundary. An index maps each
+    uid to its chunk, byte offset, size, dtype and shape. Arrays are returned as read-only views
+    of the memory-mapped chunks, so reads in index order are large sequential reads.
+
+    The store is built from a repository with build, and is read-only thereafter. Rebuilding
+    writes a new version of the store; an instance keeps reading the version it first loaded.
+
+    Args:
+        location (str): Directory of the store.
+
+    """
+
+    __index = "index.parquet"
+    __alignment = 4096
+
+    def __init__(self, location: str) -> None:
+        self._location = location
+        self._version = None
+        self._index = None
+        self._positions = None
+        self._chunks = {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(f"{self.__class__.__name__}")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, uid: str) -> bool:
+        self._load()
+        return uid in self._positions
+
+    @property
+    def index(self) -> pd.DataFrame:
+        """Returns the index of the store: uid, chunk, offset, nbytes, dtype and shape."""
+        self._load()
+        return self._index
+
+    @property
+    def uids(self) -> np.ndarray:
+        """Returns the uids in the store, in storage order."""
+        return self.index["uid"].values
+
+    def get(self, uid: str) -> np.ndarray:
+        """Returns the pixel array of an image as a read-only view of its chunk.
+
+        Args:
+            uid (str): Unique identifier for the image
+        """
+        self._load()
+        try:
+            position = self._positions[uid]
+        except KeyError:
+            msg = f"The uid, {uid} is not in the store."
+            self._logger.error(msg)
+            raise FileNotFoundError(msg)
+        return self._view(position)
+
+    def iter_arrays(self) -> Iterator[tuple]:
+        """Iterates over the (uid, pixel array) pairs of the store in storage order."""
+        self._load()
+        for position, uid in enumerate(self._index["uid"].values):
+            yield uid, self._view(position)
+
+    @classmethod
+    def build(
+        cls,
+        location: str,
+        repo: DICOMImageRepo,
+        criteria: dict = None,
+        chunk_size: int = 1024**3,
+        prefetch: int = 8,
+    ) -> PixelStore:
+        """Builds a store from the images in a repository, replacing any existing store.
+
+        The images are read through the repository's iterator, so files are read ahead while
+        records are written. A new chunk is started once a chunk reaches chunk_size bytes.
+
+        Args:
+            location (str): Directory of the store.
+            repo (DICOMImageRepo): Repository of the images.
+            criteria (dict): Registry column values to match, e.g. {"casetype": "calc"}.
+                Defaults to all images.
+            chunk_size (int): Size in bytes beyond which a new chunk is started.
+            prefetch (int): Maximum number of images read ahead of the writer.
+
+        Returns:
+            The store.
+        """
+        # Each build writes a new version, and the location is a symlink renamed over to point at
+        # it, so readers see the old or the new store, never a partial or missing one.
+        write_versioned(
+            path=location,
+            write=lambda version: cls._write(
+                directory=version,
+                repo=repo,
+                criteria=criteria,
+                chunk_size=chunk_size,
+                prefetch=prefetch,
+            ),
+        )
+        return cls(location=location.rstrip(os.sep))
+
+    @classmethod
+    def _write(
+        cls,
+        directory: str,
+        repo: DICOMImageRepo,
+        criteria: dict,
+        chunk_size: int,
+        prefetch: int,
+    ) -> None:
+        """Writes the chunks and the index of a store to the directory."""
+        records = []
+        chunk, file = -1, None
+        try:
+            for image in repo.iter_images(criteria=criteria, prefetch=prefetch):
+                if file is None or file.tell() >= chunk_size:
+                    if file is not None:
+                        file.close()
+                    chunk += 1
+                    file = open(os.path.join(directory, cls._chunk_filename(chunk)), "wb")
+                # Pad to the alignment, so each record starts on a page boundary.
+                file.write(b"\0" * (-file.tell() % cls.__alignment))
+                pixels = np.ascontiguousarray(image.dataset.pixel_array)
+                records.append(
+                    {
+                        "uid": image.uid,
+                        "chunk": chunk,
+                        "offset": file.tell(),
+                        "nbytes": pixels.nbytes,
+                        "dtype": pixels.dtype.str,
+                        "shape": ",".join(str(n) for n in pixels.shape),
+                    }
+                )
+                file.write(pixels.data)
+        finally:
+            if file is not None:
+                file.close()
+        index = pd.DataFrame(
+            records, columns=["uid", "chunk", "offset", "nbytes", "dtype", "shape"]
+        )
+        IOService.write(filepath=os.path.join(directory, cls.__index), data=index)
+
+    def _load(self) -> None:
+        """Loads the index, and the uid to position mapping, on first use."""
+        if self._index is not None:
+            return
+        with self._lock:
+            if self._index is None:
+                # The version is resolved once, so the index and chunks are of the same build.
+                self._version = os.path.realpath(self._location)
+                filepath = os.path.join(self._version, self.__index)
+                if not os.path.exists(filepath):
+                    msg = f"No pixel store exists at {self._location}."
+                    self._logger.error(msg)
+                    raise FileNotFoundError(msg)
+                index = IOService.read(filepath)
+                self._positions = dict(zip(index["uid"].values, range(len(index))))
+                self._index = index
+
+    def _view(self, position: int) -> np.ndarray:
+        """Returns the array for the record at the position in the index."""
+        chunk = int(self._index["chunk"].values[position])
+        offset = int(self._index["offset"].values[position])
+        nbytes = int(self._index["nbytes"].values[position])
+        dtype = np.dtype(self._index["dtype"].values[position])
+        shape = tuple(int(n) for n in self._index["shape"].values[position].split(","))
+        return self._map(chunk)[offset : offset + nbytes].view(dtype).reshape(shape)
+
+    def _map(self, chunk: int) -> np.memmap:
+        """Returns the read-only memory map of a chunk, opening it on first use."""
+        try:
+            return self._chunks[chunk]
+        except KeyError:
+            filepath = os.path.join(self._version, self._chunk_filename(chunk))
+            with self._lock:
+                if chunk not in self._chunks:
+                    self._chunks[chunk] = np.memmap(filepath, dtype=np.uint8, mode="r")
+            return self._chunks[chunk]
+
+    @staticmethod
+    def _chunk_filename(chunk: int) -> str:
+        """Formats the filename of a chunk."""
+        return f"chunk_{chunk:05d}.bin"
@@ -11,7 +11,7 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Friday June 2nd 2023 02:48:55 pm                                                    #
-# Modified   : Saturday June 3rd 2023 06:39:05 am                                                  #
+# Modified   : Sunday October 18th 2026 02:39:49 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
@@ -23,6 +23,7 @@ from datetime import datetime
 from dataclasses import dataclass, fields
 import logging
 
+import pandas as pd
 import pydicom
 
 from bcd import IMMUTABLE_TYPES, SEQUENCE_TYPES
@@ -78,6 +79,36 @@ class DICOMPassport(Passport):
         filtered_params = {k: v for k, v in params.items() if k in attributes}
         return cls(**filtered_params)
 
+    @classmethod
+    def join(cls, files: pd.DataFrame, metadata: pd.DataFrame) -> pd.DataFrame:
+        """Creates registrations for files by joining them to the metadata of their series.
+
+        The vectorized equivalent of creating a passport for each file. Files whose series is
+        not in the metadata are omitted.
+
+        Args:
+            files (pd.DataFrame): The file_location and filename of each file.
+            metadata (pd.DataFrame): Metadata with a row per series, and the passport fields
+                other than filename and uid as columns.
+
+        Returns:
+            DataFrame with a registration per file, and the passport fields as columns.
+        """
+        columns = [f.name for f in fields(cls)]
+        absent = set(columns) - set(metadata.columns) - {"filename", "uid"}
+        if len(absent) > 0:
+            msg = f"Metadata is missing columns {sorted(absent)}."
+            logging.getLogger(f"{cls.__name__}").error(msg)
+            raise ValueError(msg)
+        metadata = metadata.drop(columns=["filename", "uid"], errors="ignore")
+        registrations = files[["file_location", "filename"]].merge(
+            metadata, on="file_location", how="inner"
+        )
+        # Equivalent to the uid formatted in __post_init__, for filenames with an extension.
+        stems = registrations["filename"].str.replace(r"\.[^.]*$", "", regex=True)
+        registrations["uid"] = registrations["series_uid"] + "_" + stems
+        return registrations[columns]
+
     def as_dict(self) -> dict:
         """Returns a dictionary representation of the the Legend object."""
         return {k: self._export_config(v) for k, v in self.__dict__.items()}
@@ -11,7 +11,7 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Wednesday May 24th 2023 03:21:27 pm                                                 #
-# Modified   : Friday June 2nd 2023 02:56:55 pm                                                    #
+# Modified   : Sunday October 18th 2026 03:20:34 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
@@ -19,15 +19,18 @@
 
 from abc import ABC, abstractmethod
 import os
+import glob
+import time
 import logging
 import codecs
+import shutil
 import yaml
 import pickle
 import pandas as pd
 import pyarrow as pa
 import json
 import pyarrow.parquet as pq
-from typing import Any, Union, List
+from typing import Any, Callable, Union, List
 
 
 # ------------------------------------------------------------------------------------------------ #
@@ -215,16 +218,90 @@ class PickleIO(IO):  # pragma: no cover
 
 class ParquetIO(IO):  # pragma: no cover
     @classmethod
-    def _read(cls, filepath: str, **kwargs) -> Any:
-        """Read the pyarrow table, then convert to pandas."""
-        table = pa.parquet.read_table(filepath, memory_map=True)
+    def _read(
+        cls,
+        filepath: str,
+        columns: List[str] = None,
+        filters: list = None,
+        **kwargs,
+    ) -> Any:
+        """Read the pyarrow table, then convert to pandas.
+
+        Column selection and filters are pushed down to pyarrow, so only the selected columns of
+        the matching partitions and row groups are read. A versioned dataset is resolved once, so
+        the whole read is of one version.
+        """
+        filepath = os.path.realpath(filepath)
+        table = pa.parquet.read_table(filepath, columns=columns, filters=filters, memory_map=True)
         return table.to_pandas()
 
     @classmethod
-    def _write(cls, filepath: str, data: pd.DataFrame, **kwargs) -> None:
-        """Converts Pandas DataFrame to a pyarrow table, then persists."""
-        table = pa.Table.from_pandas(data)
-        pq.write_table(table, filepath)
+    def _write(
+        cls,
+        filepath: str,
+        data: pd.DataFrame,
+        partition_cols: List[str] = None,
+        **kwargs,
+    ) -> None:
+        """Converts Pandas DataFrame to a pyarrow table, then persists.
+
+        With partition_cols, the table is written as a dataset directory partitioned on those
+        columns. Each write goes to a new version directory, and the filepath is a symlink that is
+        renamed over to point at it, so readers see the old or the new dataset, never neither.
+        The version it replaces is kept for readers still reading it; older versions are removed.
+        """
+        if partition_cols is None:
+            table = pa.Table.from_pandas(data)
+            pq.write_table(table, filepath)
+        else:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            write_versioned(
+                path=filepath,
+                write=lambda version: pq.write_to_dataset(
+                    table, root_path=version, partition_cols=partition_cols
+                ),
+            )
+
+
+# ------------------------------------------------------------------------------------------------ #
+def write_versioned(path: str, write: Callable[[str], None]) -> str:
+    """Writes a new version of a directory, then switches the path to it atomically.
+
+    The path is a symlink that is renamed over to point at the new version, so readers see the old
+    or the new directory, never neither. The version it replaces is kept for readers still using
+    it; older versions are removed. A directory written before versioning is moved aside once, as
+    a version.
+
+    Args:
+        path (str): The directory path readers open.
+        write (Callable): Writes the contents of the version directory it is passed. If it
+            raises, the version directory is removed and the path is left as it was.
+
+    Returns:
+        The new version directory.
+    """
+    path = path.rstrip(os.sep)
+    version = f"{path}.v{time.time_ns()}.{os.getpid()}"
+    os.makedirs(version)
+    try:
+        write(version)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    if os.path.isdir(path) and not os.path.islink(path):
+        previous = os.path.realpath(f"{path}.v0")
+        os.rename(path, previous)
+    else:
+        previous = os.path.realpath(path) if os.path.lexists(path) else None
+    link = f"{path}.{os.getpid()}.link"
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+    # Glob matches are relative when the path is, so both sides are resolved before comparing.
+    keep = {os.path.realpath(version), previous}
+    for candidate in glob.glob(glob.escape(path) + ".v*"):
+        if os.path.realpath(candidate) not in keep:
+            shutil.rmtree(candidate, ignore_errors=True)
+    return version
 
 
 # ------------------------------------------------------------------------------------------------ #
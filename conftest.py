@@ -11,7 +11,7 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Tuesday May 30th 2023 11:25:42 pm                                                   #
-# Modified   : Saturday June 3rd 2023 06:35:30 am                                                  #
+# Modified   : Sunday October 18th 2026 02:55:14 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
@@ -36,6 +36,19 @@ LOCATION = "tests/data"
 collect_ignore_glob = []
 
 
+# ------------------------------------------------------------------------------------------------ #
+#                                      BENCHMARKS                                                  #
+# ------------------------------------------------------------------------------------------------ #
+def pytest_collection_modifyitems(config, items):
+    """Skips benchmarks unless they're selected, e.g. with -m benchmark."""
+    if "benchmark" in config.getoption("markexpr", default=""):
+        return
+    skip = pytest.mark.skip(reason="Benchmarks run only when selected with -m benchmark.")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 # ------------------------------------------------------------------------------------------------ #
 #                                       DATASET                                                    #
 # ------------------------------------------------------------------------------------------------ #
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_ingest.py                                                     #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:31:45 am                                                #
+# Modified   : Sunday October 18th 2026 02:31:57 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import shutil
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+import pandas as pd
+
+from bcd.data.prep.ingest import Ingestor
+from bcd.data.repo.image import DICOMImageRepo
+from bcd.data.repo.registry import ImageRegistry
+from bcd.data.study.image import DICOMPassport
+
+LOCATION = "tests/data"
+INGESTDIR = "tests/data/ingest"
+METADATA = "tests/data/ingest/metadata.csv"
+REGISTRY = "tests/data/ingest/registry.csv"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.ingest
+class TestIngestor:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(INGESTDIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_run(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Metadata with a row per series of the test images, and a series that wasn't downloaded.
+        metadata = pd.DataFrame(registrations).drop(columns=["filename", "uid"], errors="ignore")
+        metadata = metadata.drop_duplicates(subset="file_location")
+        missing = metadata.iloc[:1].assign(series_uid="0.0", file_location="./CBIS-DDSM/missing")
+        os.makedirs(INGESTDIR, exist_ok=True)
+        pd.concat([metadata, missing]).to_csv(METADATA, index=False)
+
+        registry = ImageRegistry(filepath=REGISTRY)
+        repo = DICOMImageRepo(location=LOCATION, registry=registry, immutable=False)
+        result = Ingestor(repo=repo, metadata=METADATA, batch_size=8, max_workers=2).run()
+        assert result.ok
+        assert result.missing == ["./CBIS-DDSM/missing"]
+        assert result.throughput > 0
+        uids = [DICOMPassport.create(registration).uid for registration in registrations]
+        assert sorted(result.succeeded) == sorted(uids)
+        assert sorted(registry.get_uids()) == sorted(uids)
+        image = repo.get(uid=uids[0])
+        assert image.passport.filename == DICOMPassport.create(registrations[0]).filename
+
+        # Images already registered are reported as failures.
+        result = Ingestor(repo=repo, metadata=METADATA).run()
+        assert len(result.succeeded) == 0
+        assert sorted(result.failed) == sorted(uids)
+        with pytest.raises(ValueError):
+            Ingestor(repo=repo, metadata=METADATA, batch_size=0)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(INGESTDIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
@@ -0,0 +1,707 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_image_repo.py                                       #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:19:26 am                                                #
+# Modified   : Sunday October 18th 2026 02:59:49 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import shutil
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+import numpy as np
+import pandas as pd
+import pydicom
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
+from pydicom.dataelem import RawDataElement
+
+from bcd.data.repo.image import DICOMImageRepo
+from bcd.data.repo.registry import ImageRegistry
+from bcd.data.study.image import DICOMImage, DICOMPassport
+
+LOCATION = "tests/data"
+REPODIR = "tests/data/image_repo"
+REGISTRY = "tests/data/image_repo/registry.csv"
+CACHED_REGISTRY = "tests/data/image_repo/cached/registry.csv"
+IMPORTDIR = "tests/data/image_repo/imported"
+IMPORTED_REGISTRY = "tests/data/image_repo/imported/registry.csv"
+RESCANDIR = "tests/data/image_repo/rescanned"
+RESCANNED_REGISTRY = "tests/data/image_repo/rescanned/registry.csv"
+SNAPSHOTDIR = "tests/data/image_repo/imported/snapshots/baseline"
+PIXEL_DATA = 0x7FE00010
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.image_repo
+class TestDICOMImageRepo:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REPODIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_lazy_get(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        registry = ImageRegistry(filepath=REGISTRY)
+        registry.add_many(passports)
+        repo = DICOMImageRepo(location=LOCATION, registry=registry)
+
+        for passport in passports:
+            filepath = os.path.join(LOCATION, passport["file_location"], passport["filename"])
+            expected = pydicom.dcmread(filepath)
+            image = repo.get(uid=passport["uid"], lazy=True)
+            # Pixel data is deferred until accessed. get_item would read it, so check the raw dict.
+            pixel_data = image.dataset._dict[PIXEL_DATA]
+            assert isinstance(pixel_data, RawDataElement)
+            assert pixel_data.value is None
+            assert image.dataset.SOPInstanceUID == expected.SOPInstanceUID
+            assert np.array_equal(image.dataset.pixel_array, expected.pixel_array)
+
+        result = repo.get_many(uids=[passport["uid"] for passport in passports], lazy=True)
+        assert result.ok
+        assert len(result.results) == len(passports)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_get_many(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = ImageRegistry(filepath=REGISTRY)
+        repo = DICOMImageRepo(location=LOCATION, registry=registry)
+        uids = list(registry.get_uids())[::-1] + ["nope"]
+
+        result = repo.get_many(uids=uids, max_workers=4)
+        assert list(result.failed.keys()) == ["nope"]
+        assert isinstance(result.failed["nope"], FileNotFoundError)
+        assert result.succeeded == uids[:-1]
+        for uid, image in zip(result.succeeded, result.results):
+            expected = repo.get(uid=uid)
+            assert image.uid == uid
+            assert np.array_equal(image.dataset.pixel_array, expected.dataset.pixel_array)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_iter_images(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = ImageRegistry(filepath=REGISTRY)
+        repo = DICOMImageRepo(location=LOCATION, registry=registry)
+        uids = list(registry.get_uids())
+
+        assert [image.uid for image in repo.iter_images(prefetch=2)] == uids
+
+        batches = list(repo.iter_images(batch_size=3))
+        assert all(len(batch) == 3 for batch in batches[:-1])
+        assert [image.uid for batch in batches for image in batch] == uids
+
+        casetype = registry.get(uids[0])["casetype"]
+        expected = list(registry.by_casetype(casetype))
+        images = repo.iter_images(criteria={"casetype": casetype}, lazy=True)
+        assert [image.uid for image in images] == expected
+
+        # The iterator can be abandoned before it is exhausted.
+        images = repo.iter_images(prefetch=4)
+        assert next(images).uid == uids[0]
+        images.close()
+
+        with pytest.raises(ValueError):
+            next(repo.iter_images(prefetch=0))
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_cache(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        passports = [DICOMPassport.create(registration) for registration in registrations]
+        images = []
+        for passport in passports:
+            filepath = os.path.join(LOCATION, passport.file_location, passport.filename)
+            images.append(DICOMImage(passport=passport, dataset=pydicom.dcmread(filepath)))
+        # Each cached dataset is the file plus its decoded pixels; leave room for two.
+        image = images[0]
+        filepath = os.path.join(LOCATION, image.passport.file_location, image.passport.filename)
+        size = os.path.getsize(filepath) + image.dataset.pixel_array.nbytes
+        registry = ImageRegistry(filepath=CACHED_REGISTRY)
+        repo = DICOMImageRepo(
+            location=REPODIR, registry=registry, immutable=False, cache_size=2 * size
+        )
+        assert repo.add_many(images=images).ok
+        uids = [image.uid for image in images]
+
+        repo.get(uid=uids[0])
+        repo.get(uid=uids[1])
+        repo.get(uid=uids[0])
+        stats = repo.cache_stats
+        assert (stats.hits, stats.misses, stats.evictions, stats.items) == (1, 2, 0, 2)
+
+        # uids[1] is the least recently used
+        repo.get(uid=uids[2])
+        repo.get(uid=uids[0])
+        repo.get(uid=uids[1])
+        stats = repo.cache_stats
+        assert (stats.hits, stats.misses, stats.evictions) == (2, 4, 2)
+        assert stats.size <= 2 * size
+
+        # Updates and removes invalidate the cached dataset
+        image = repo.get(uid=uids[1])
+        image.dataset.PatientID = "cached"
+        repo.update(image=image)
+        assert repo.get(uid=uids[1]).dataset.PatientID == "cached"
+        assert repo.cache_stats.misses == 5
+        repo.remove(uid=uids[1])
+        with pytest.raises(FileNotFoundError):
+            repo.get(uid=uids[1])
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_pixel_sidecars(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Uses the repository written by test_cache
+        registry = ImageRegistry(filepath=CACHED_REGISTRY)
+        repo = DICOMImageRepo(location=REPODIR, registry=registry, immutable=False)
+        uids = list(registry.get_uids())
+
+        result = repo.build_sidecars(max_workers=2)
+        assert result.ok
+        assert all(os.path.exists(sidecar) for sidecar in result.results)
+
+        uid = uids[0]
+        pixels = repo.get_pixels(uid=uid)
+        assert isinstance(pixels, np.memmap)
+        assert not pixels.flags.writeable
+        image = repo.get(uid=uid)
+        assert np.array_equal(pixels, image.dataset.pixel_array)
+
+        # Updating the file makes the sidecar stale; it is rebuilt on the next read.
+        image.dataset.PixelData = (image.dataset.pixel_array // 2).tobytes()
+        repo.update(image=image)
+        assert np.array_equal(repo.get_pixels(uid=uid), repo.get(uid=uid).dataset.pixel_array)
+        assert len(repo._find_sidecars(uid)) == 1
+
+        repo.remove(uid=uid)
+        assert len(repo._find_sidecars(uid)) == 0
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_pyramid(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Uses the repository written by test_cache
+        registry = ImageRegistry(filepath=CACHED_REGISTRY)
+        repo = DICOMImageRepo(location=REPODIR, registry=registry, immutable=False)
+        uids = list(registry.get_uids())
+
+        result = repo.build_pyramids(max_workers=2)
+        assert result.ok
+        assert all(len(levels) == 3 for levels in result.results)
+
+        uid = uids[0]
+        pixels = repo.get(uid=uid).dataset.pixel_array
+        rows, cols = pixels.shape
+        # Each level averages 2x2 blocks of the level above.
+        half = pixels[: rows // 2 * 2, : cols // 2 * 2].astype(np.int64)
+        half = (half[::2, ::2] + half[1::2, ::2] + half[::2, 1::2] + half[1::2, 1::2] + 2) // 4
+        assert np.array_equal(repo.get_thumbnail(uid=uid, max_dim=max(rows, cols) // 2), half)
+        assert np.array_equal(repo.get_thumbnail(uid=uid, max_dim=max(rows, cols)), pixels)
+        thumbnail = repo.get_thumbnail(uid=uid, max_dim=max(rows, cols) // 5)
+        assert thumbnail.shape == (rows // 8, cols // 8)
+        # The smallest level is served if none is small enough.
+        assert repo.get_thumbnail(uid=uid, max_dim=1).shape == (rows // 8, cols // 8)
+        with pytest.raises(ValueError):
+            repo.get_thumbnail(uid=uid, max_dim=0)
+
+        repo.remove(uid=uid)
+        assert len(repo._find_levels(uid)) == 0
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_get_region(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Uses the repository written by test_cache
+        registry = ImageRegistry(filepath=CACHED_REGISTRY)
+        repo = DICOMImageRepo(location=REPODIR, registry=registry, immutable=False)
+        uid = list(registry.get_uids())[0]
+
+        image = repo.get(uid=uid)
+        pixels = image.dataset.pixel_array
+        rows, cols = slice(pixels.shape[0] // 4, pixels.shape[0] // 2), slice(None, None, 3)
+        region = repo.get_region(uid=uid, row_slice=rows, col_slice=cols)
+        assert np.array_equal(region, pixels[rows, cols])
+        syntax = image.dataset.file_meta.TransferSyntaxUID
+        if syntax in (ExplicitVRLittleEndian, ImplicitVRLittleEndian):
+            # The region is a view of the file, not a decoded copy.
+            assert isinstance(region, np.memmap)
+            assert not region.flags.writeable
+
+        # The layout is read again once the file is modified.
+        image.dataset.PixelData = (pixels // 2).tobytes()
+        repo.update(image=image)
+        region = repo.get_region(uid=uid, row_slice=rows, col_slice=cols)
+        assert np.array_equal(region, pixels[rows, cols] // 2)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_import(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        passports = [DICOMPassport.create(registration) for registration in registrations]
+        sources = [os.path.join(LOCATION, p.file_location, p.filename) for p in passports]
+        registry = ImageRegistry(filepath=IMPORTED_REGISTRY)
+        repo = DICOMImageRepo(location=IMPORTDIR, registry=registry, immutable=False)
+
+        result = repo.import_many(passports=passports[1:], sources=sources[1:])
+        assert result.ok
+        for passport, source in zip(passports[1:], sources[1:]):
+            filepath = os.path.join(IMPORTDIR, passport.file_location, passport.filename)
+            # Files on the same filesystem are hardlinked.
+            assert os.path.samefile(filepath, source)
+        with pytest.raises(FileNotFoundError):
+            repo.import_file(passport=passports[0], source=sources[0] + ".missing")
+        assert passports[0].uid not in list(registry.get_uids())
+
+        # An unmodified dataset is placed from its file rather than re-encoded.
+        repo.add(image=DICOMImage(passport=passports[0], dataset=pydicom.dcmread(sources[0])))
+        filepath = os.path.join(IMPORTDIR, passports[0].file_location, passports[0].filename)
+        assert os.path.samefile(filepath, sources[0])
+
+        # Updates replace the linked file, leaving the source unchanged.
+        image = repo.get(uid=passports[0].uid)
+        pixels = image.dataset.pixel_array
+        image.dataset.PixelData = (pixels // 2).tobytes()
+        repo.update(image=image)
+        assert not os.path.samefile(filepath, sources[0])
+        assert np.array_equal(pydicom.dcmread(sources[0]).pixel_array, pixels)
+        assert np.array_equal(repo.get(uid=passports[0].uid).dataset.pixel_array, pixels // 2)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_update_unmodified(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Uses the repository written by test_import, whose files are linked to the sources.
+        registry = ImageRegistry(filepath=IMPORTED_REGISTRY)
+        repo = DICOMImageRepo(location=IMPORTDIR, registry=registry, immutable=False)
+        passports = [DICOMPassport.create(registration) for registration in registrations]
+        sources = [os.path.join(LOCATION, p.file_location, p.filename) for p in passports]
+        filepaths = [os.path.join(IMPORTDIR, p.file_location, p.filename) for p in passports]
+
+        # An unmodified dataset updates the registry alone.
+        repo.build_sidecars(uids=[passports[1].uid])
+        registration = {**passports[1].as_dict(), "series_description": "corrected"}
+        passport = DICOMPassport.create(registration)
+        repo.update(image=DICOMImage(passport=passport, dataset=repo.get(uid=passport.uid).dataset))
+        assert registry.get(uid=passport.uid)["series_description"] == "corrected"
+        assert os.path.samefile(filepaths[1], sources[1])
+        assert len(repo._find_sidecars(passport.uid)) == 1
+
+        # A modified header is rewritten, and the pixel data copied from the file.
+        image = repo.get(uid=passports[2].uid, lazy=True)
+        image.dataset.PatientID = "corrected"
+        repo.update(image=image)
+        assert not os.path.samefile(filepaths[2], sources[2])
+        dataset = pydicom.dcmread(filepaths[2])
+        source = pydicom.dcmread(sources[2])
+        assert dataset.PatientID == "corrected"
+        assert source.PatientID != "corrected"
+        assert np.array_equal(dataset.pixel_array, source.pixel_array)
+
+        result = repo.update_many(images=[repo.get(uid=p.uid) for p in passports[3:]])
+        assert result.ok
+        assert all(os.path.samefile(f, s) for f, s in zip(filepaths[3:], sources[3:]))
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_rescan(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        passports = [DICOMPassport.create(registration) for registration in registrations]
+        sources = [os.path.join(LOCATION, p.file_location, p.filename) for p in passports]
+        filepaths = [os.path.join(RESCANDIR, p.file_location, p.filename) for p in passports]
+        metadata = pd.DataFrame(registrations).drop(columns=["filename", "uid"], errors="ignore")
+        metadata = metadata.drop_duplicates(subset="file_location")
+        registry = ImageRegistry(filepath=RESCANNED_REGISTRY)
+        repo = DICOMImageRepo(location=RESCANDIR, registry=registry, immutable=False)
+        assert repo.import_many(passports=passports[1:], sources=sources[1:]).ok
+
+        # The first rescan has no manifest, so every file is new; registered images are re-registered.
+        result = repo.rescan(metadata=metadata, max_workers=2)
+        assert result.ok
+        assert sorted(result.updated) == sorted(p.uid for p in passports[1:])
+        result = repo.rescan(metadata=metadata)
+        assert result.unchanged == len(passports) - 1
+        assert result.added == result.updated == result.removed == []
+
+        os.link(sources[0], filepaths[0])
+        os.remove(filepaths[1])
+        result = repo.rescan(metadata=metadata)
+        assert result.added == [passports[0].uid]
+        assert result.removed == [passports[1].uid]
+        assert result.unchanged == len(passports) - 2
+        assert passports[1].uid not in list(registry.get_uids())
+        assert repo.get(uid=passports[0].uid).uid == passports[0].uid
+
+        # Unreadable files are reported as failures, and retried until they're readable.
+        os.remove(filepaths[2])
+        with open(filepaths[2], "wb") as file:
+            file.write(b"not a DICOM file")
+        for _ in range(2):
+            result = repo.rescan(metadata=metadata)
+            assert list(result.failed) == [passports[2].uid]
+            assert result.updated == []
+        os.remove(filepaths[2])
+        os.link(sources[2], filepaths[2])
+        result = repo.rescan(metadata=metadata)
+        assert result.ok
+        assert result.updated == [passports[2].uid]
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_snapshot(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        # Uses the repository written by test_import and updated by test_update_unmodified.
+        registry = ImageRegistry(filepath=IMPORTED_REGISTRY)
+        repo = DICOMImageRepo(location=IMPORTDIR, registry=registry, immutable=False)
+        passports = [DICOMPassport.create(registration) for registration in registrations]
+        filepaths = [os.path.join(IMPORTDIR, p.file_location, p.filename) for p in passports]
+
+        snapshot = repo.snapshot(name="baseline")
+        assert snapshot.immutable
+        assert snapshot.registry.equals(repo.registry)
+        snapshot_filepaths = [
+            os.path.join(SNAPSHOTDIR, p.file_location, p.filename) for p in passports
+        ]
+        assert all(os.path.samefile(f, s) for f, s in zip(filepaths, snapshot_filepaths))
+        with pytest.raises(FileExistsError):
+            repo.snapshot(name="baseline")
+        with pytest.raises(PermissionError):
+            snapshot.remove(uid=passports[0].uid)
+
+        # Updates and removes in the repository leave the snapshot unchanged.
+        image = repo.get(uid=passports[3].uid, lazy=True)
+        image.dataset.PatientID = "changed"
+        repo.update(image=image)
+        repo.remove(uid=passports[4].uid)
+        assert not os.path.samefile(filepaths[3], snapshot_filepaths[3])
+        snapshot = repo.get_snapshot(name="baseline")
+        assert snapshot.get(uid=passports[3].uid).dataset.PatientID != "changed"
+        assert snapshot.get(uid=passports[4].uid).passport.uid == passports[4].uid
+        assert len(snapshot.registry) == len(repo.registry) + 1
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REPODIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
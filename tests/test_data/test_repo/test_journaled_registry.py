@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_journaled_registry.py                               #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 01:56:40 am                                                #
+# Modified   : Sunday October 18th 2026 03:24:34 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+from bcd.data.repo.registry import JournaledImageRegistry
+from bcd.data.study.image import DICOMPassport
+
+REGISTRY = "tests/data/CBIS-DDSM/journaled_registry.csv"
+JOURNAL = "tests/data/CBIS-DDSM/journaled_registry.journal"
+NEXT_ID = "tests/data/CBIS-DDSM/journaled_registry.ids.json"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.journal
+class TestJournaledRegistry:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        for filepath in (REGISTRY, JOURNAL, NEXT_ID):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_add(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = JournaledImageRegistry(filepath=REGISTRY)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        for passport in passports:
+            registry.add(registration=passport)
+
+        with pytest.raises(FileExistsError):
+            registry.add(registration=passports[0])
+
+        # Mutations are journaled; the snapshot is not written until compaction.
+        assert os.path.exists(JOURNAL)
+        assert not os.path.exists(REGISTRY)
+        assert registry.count == len(passports)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_replay(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = JournaledImageRegistry(filepath=REGISTRY)
+        other = JournaledImageRegistry(filepath=REGISTRY)
+        uids = registry.get_uids()
+
+        reg = registry.get(uids[0])
+        reg["casetype"] = "mental"
+        registry.update(registration=reg)
+        registry.remove(uid=uids[1])
+
+        # The other instance replays only the new journal records.
+        assert other.get(uids[0])["casetype"] == "mental"
+        assert not other._exists(uids[1])
+        assert other.count == registry.count == len(uids) - 1
+        assert len(other.registry) == other.count
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_compact(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = JournaledImageRegistry(filepath=REGISTRY)
+        count = registry.count
+        uid = registry.get_uids()[0]
+        registry.compact()
+
+        assert os.path.exists(REGISTRY)
+        assert os.path.getsize(JOURNAL) == 0
+
+        other = JournaledImageRegistry(filepath=REGISTRY)
+        assert other.count == count
+        assert other.get(uid)["casetype"] == "mental"
+
+        # Exceeding the journal limit compacts automatically.
+        small = JournaledImageRegistry(filepath=REGISTRY, journal_limit=1)
+        small.remove(uid=uid)
+        assert os.path.getsize(JOURNAL) == 0
+        assert other.count == count - 1
+
+        # The id of a removed image is not reassigned once the journal is compacted.
+        ids = other.registry.set_index("uid")["id"]
+        last = ids.idxmax()
+        reg = other.get(last)
+        other.remove(uid=last)
+        other.compact()
+        JournaledImageRegistry(filepath=REGISTRY).add(registration=reg)
+        assert other.to_ids([last])[0] == ids.max() + 1
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        for filepath in (REGISTRY, JOURNAL, NEXT_ID):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
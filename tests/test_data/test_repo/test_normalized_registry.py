@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_normalized_registry.py                              #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:56:12 am                                                #
+# Modified   : Sunday October 18th 2026 02:56:45 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import shutil
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+from bcd.data.repo.registry import NormalizedImageRegistry
+from bcd.data.study.image import DICOMPassport
+
+REGISTRY = "tests/data/CBIS-DDSM/normalized/registry.csv"
+SERIES = "tests/data/CBIS-DDSM/normalized/registry_series.csv"
+REGISTRY_DIR = "tests/data/CBIS-DDSM/normalized"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.normalized
+class TestNormalizedRegistry:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_add(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = NormalizedImageRegistry(filepath=REGISTRY)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        assert registry.add_many(registrations=passports).ok
+        with pytest.raises(FileExistsError):
+            registry.add(registration=passports[0])
+
+        # Series level fields are stored once per series and joined back on get.
+        series = {passport["series_uid"] for passport in passports}
+        assert os.path.exists(SERIES)
+        assert len(registry._series) == len(series)
+        assert registry.get(uid=passports[0]["uid"]) == passports[0]
+        assert len(registry.registry) == registry.count == len(passports)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_series_conflicts(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = NormalizedImageRegistry(filepath=REGISTRY)
+        image = registry.get(uid=registry.get_uids()[0])
+        sibling = {**image, "uid": image["uid"] + ".2", "filename": "sibling.dcm"}
+        registry.add(registration=sibling)
+
+        # A file can't change the fields it shares with the rest of its series.
+        with pytest.raises(ValueError):
+            registry.update(registration={**image, "file_location": "moved"})
+        result = registry.add_many(
+            registrations=[{**sibling, "uid": image["uid"] + ".3", "download_timestamp": "later"}]
+        )
+        assert isinstance(result.failed[image["uid"] + ".3"], ValueError)
+        result = registry.update_many(registrations=[image, {**sibling, "file_location": "moved"}])
+        assert set(result.failed) == {image["uid"], sibling["uid"]}
+        assert registry.get(uid=sibling["uid"]) == sibling
+
+        # Updating every file of the series changes the series.
+        members = registry.get_many(uids=registry.by_series(series_uid=image["series_uid"])).results
+        moved = [{**registration, "file_location": "moved"} for registration in members]
+        assert registry.update_many(registrations=moved).ok
+        other = NormalizedImageRegistry(filepath=REGISTRY)
+        assert other.get(uid=image["uid"])["file_location"] == "moved"
+        assert other.get(uid=sibling["uid"])["file_location"] == "moved"
+
+        # Files moved to another series don't change the series they left.
+        registry.update(
+            registration={**sibling, "series_uid": "moved", "file_location": "elsewhere"}
+        )
+        assert registry.get(uid=image["uid"])["file_location"] == "moved"
+        registry.remove(uid=sibling["uid"])
+        assert "moved" not in set(registry._series["series_uid"])
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_parquet_registry.py                                 #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:54:11 am                                                #
+# Modified   : Sunday October 18th 2026 02:54:59 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import glob
+import shutil
+import inspect
+from datetime import datetime
+import pytest
+import logging
+from multiprocessing import Pool
+
+from bcd.data.repo.registry import ParquetImageRegistry
+from bcd.data.study.image import DICOMPassport
+
+REGISTRY = "tests/data/CBIS-DDSM/parquet/registry.parquet"
+REGISTRY_DIR = "tests/data/CBIS-DDSM/parquet"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+def count_registrations(reads: int) -> list:
+    """Counts the registrations with a new instance for each read, from a worker process."""
+    return [len(ParquetImageRegistry(filepath=REGISTRY).registry) for _ in range(reads)]
+
+
+@pytest.mark.parquet
+class TestParquetRegistry:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_add(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = ParquetImageRegistry(filepath=REGISTRY)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        result = registry.add_many(registrations=passports[1:])
+        assert result.ok
+        registry.add(registration=passports[0])
+        with pytest.raises(FileExistsError):
+            registry.add(registration=passports[0])
+
+        # The dataset is a link to its current version, partitioned by casetype and fileset.
+        assert os.path.islink(REGISTRY)
+        assert registry.count == len(passports)
+        assert registry.get(uid=passports[0]["uid"])["filename"] == passports[0]["filename"]
+        assert len(registry.select(casetype=passports[0]["casetype"])) > 0
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_update_remove(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = ParquetImageRegistry(filepath=REGISTRY)
+        other = ParquetImageRegistry(filepath=REGISTRY)
+        uids = list(registry.get_uids())
+        count = other.count
+
+        registration = registry.get(uid=uids[0])
+        registration["series_description"] = "corrected"
+        registry.update(registration=registration)
+        with pytest.raises(FileNotFoundError):
+            registry.update(registration={**registration, "uid": "unregistered"})
+        registry.remove(uid=uids[1])
+        with pytest.raises(FileNotFoundError):
+            registry.remove(uid=uids[1])
+
+        # Another instance reloads the new version of the dataset.
+        assert other.get(uid=uids[0])["series_description"] == "corrected"
+        assert not other._exists(uids[1])
+        assert other.count == count - 1
+        # Only the current version and the one it replaced are kept.
+        assert len(glob.glob(REGISTRY + ".v*")) == 2
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_concurrent_reads(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = ParquetImageRegistry(filepath=REGISTRY)
+        count = registry.count
+        registration = registry.get(uid=registry.get_uids()[0])
+        with Pool(processes=2) as pool:
+            reads = [pool.apply_async(count_registrations, (50,)) for _ in range(2)]
+            for i in range(20):
+                registration["series_description"] = f"revision {i}"
+                registry.update(registration=registration)
+            counts = [n for read in reads for n in read.get()]
+        # Readers never find the registry missing while it's rewritten.
+        assert counts == [count] * len(counts)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(REGISTRY_DIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
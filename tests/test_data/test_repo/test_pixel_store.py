@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_pixel_store.py                                      #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 02:24:52 am                                                #
+# Modified   : Sunday October 18th 2026 03:21:22 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import glob
+import shutil
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+import numpy as np
+
+from bcd.data.repo.image import DICOMImageRepo
+from bcd.data.repo.registry import ImageRegistry
+from bcd.data.repo.store import PixelStore
+from bcd.data.study.image import DICOMPassport
+
+LOCATION = "tests/data"
+STOREDIR = "tests/data/pixel_store"
+REGISTRY = "tests/data/pixel_store_registry/registry.csv"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.pixel_store
+class TestPixelStore:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        if os.path.islink(STOREDIR):
+            os.remove(STOREDIR)
+        for path in [STOREDIR] + glob.glob(STOREDIR + ".v*"):
+            shutil.rmtree(path, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(REGISTRY), ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_build(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        registry = ImageRegistry(filepath=REGISTRY)
+        registry.add_many(passports)
+        repo = DICOMImageRepo(location=LOCATION, registry=registry)
+
+        # A small chunk size spreads the images over several chunks.
+        store = PixelStore.build(location=STOREDIR, repo=repo, chunk_size=16384)
+        assert len(store) == len(passports)
+        assert store.index["chunk"].nunique() > 1
+        assert (store.index["offset"] % 4096 == 0).all()
+
+        store = PixelStore(location=STOREDIR)
+        for passport in passports:
+            pixels = store.get(passport["uid"])
+            assert not pixels.flags.writeable
+            assert np.array_equal(pixels, repo.get(passport["uid"]).dataset.pixel_array)
+        assert [uid for uid, _ in store.iter_arrays()] == list(registry.get_uids())
+        with pytest.raises(FileNotFoundError):
+            store.get("nope")
+
+        # Rebuilding replaces the store, while open stores keep reading the version they loaded.
+        casetype = passports[0]["casetype"]
+        rebuilt = PixelStore.build(location=STOREDIR, repo=repo, criteria={"casetype": casetype})
+        assert list(rebuilt.uids) == list(registry.by_casetype(casetype))
+        assert os.path.islink(STOREDIR)
+        assert len(glob.glob(STOREDIR + ".v*")) == 2
+        assert len(store) == len(passports)
+        for passport in passports:
+            assert np.array_equal(
+                store.get(passport["uid"]), repo.get(passport["uid"]).dataset.pixel_array
+            )
+
+        # A failed build removes its version, and leaves the store as it was.
+        versions = sorted(glob.glob(STOREDIR + ".v*"))
+        with pytest.raises(ValueError):
+            PixelStore.build(location=STOREDIR, repo=repo, prefetch=0)
+        assert sorted(glob.glob(STOREDIR + ".v*")) == versions
+        assert list(PixelStore(location=STOREDIR).uids) == list(rebuilt.uids)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        if os.path.islink(STOREDIR):
+            os.remove(STOREDIR)
+        for path in [STOREDIR] + glob.glob(STOREDIR + ".v*"):
+            shutil.rmtree(path, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(REGISTRY), ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
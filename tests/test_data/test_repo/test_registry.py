@@ -11,18 +11,30 @@
 # URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
 # ------------------------------------------------------------------------------------------------ #
 # Created    : Friday June 2nd 2023 09:46:00 pm                                                    #
-# Modified   : Saturday June 3rd 2023 01:48:05 am                                                  #
+# Modified   : Sunday October 18th 2026 03:26:16 am                                                #
 # ------------------------------------------------------------------------------------------------ #
 # License    : MIT License                                                                         #
 # Copyright  : (c) 2023 John James                                                                 #
 # ================================================================================================ #
 import os
+import shutil
 import inspect
+import threading
 from datetime import datetime
 import pytest
 import logging
+from multiprocessing import Pool
+
+import numpy as np
+
+from bcd.data.repo.registry import ImageRegistry
+from bcd.data.study.image import DICOMPassport
 
 REGISTRY = "tests/data/CBIS-DDSM/registry.csv"
+CONCURRENT_REGISTRY = "tests/data/CBIS-DDSM/concurrent/registry.csv"
+UID_INDEX = "tests/data/CBIS-DDSM/registry.uidx.npy"
+UID_INDEX_METADATA = "tests/data/CBIS-DDSM/registry.uidx.json"
+NEXT_ID = "tests/data/CBIS-DDSM/registry.ids.json"
 # ------------------------------------------------------------------------------------------------ #
 logger = logging.getLogger(__name__)
 # ------------------------------------------------------------------------------------------------ #
@@ -30,6 +42,13 @@ double_line = f"\n{100 * '='}"
 single_line = f"\n{100 * '-'}"
 
 
+def register(registrations: list) -> None:
+    """Registers images one at a time, from a worker process."""
+    registry = ImageRegistry(filepath=CONCURRENT_REGISTRY)
+    for registration in registrations:
+        registry.add(registration=registration)
+
+
 @pytest.mark.registry
 class TestRegistry:  # pragma: no cover
     # ============================================================================================ #
@@ -45,8 +64,9 @@ class TestRegistry:  # pragma: no cover
         )
         logger.info(double_line)
         # ---------------------------------------------------------------------------------------- #
-        if os.path.exists(REGISTRY):
-            os.remove(REGISTRY)
+        for filepath in (REGISTRY, UID_INDEX, UID_INDEX_METADATA, NEXT_ID):
+            if os.path.exists(filepath):
+                os.remove(filepath)
         # ---------------------------------------------------------------------------------------- #
         end = datetime.now()
         duration = round((end - start).total_seconds(), 1)
@@ -247,6 +267,365 @@ class TestRegistry:  # pragma: no cover
         )
         logger.info(single_line)
 
+    # ============================================================================================ #
+    def test_batch(self, registry, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        uids = list(registry.get_uids())
+        regs = [registry.get(uid) for uid in uids]
+
+        result = registry.remove_many(uids=uids + ["xya"])
+        assert result.succeeded == uids
+        assert isinstance(result.failed["xya"], FileNotFoundError)
+        assert registry.count == 0
+
+        # Every copy of a uid repeated within the batch is rejected.
+        result = registry.add_many(registrations=regs + regs[:1])
+        assert result.succeeded == uids[1:]
+        assert list(result.failed) == uids[:1]
+        assert isinstance(result.failed[uids[0]], FileExistsError)
+        assert registry.count == len(uids) - 1
+
+        assert registry.remove_many(uids=uids[1:]).ok
+        assert registry.add_many(registrations=regs).ok
+        result = registry.add_many(registrations=regs[:1])
+        assert isinstance(result.failed[uids[0]], FileExistsError)
+        assert registry.count == len(uids)
+
+        for reg in regs:
+            reg["casetype"] = "batch"
+        result = registry.update_many(registrations=regs)
+        assert result.ok
+        for uid in uids:
+            assert registry.get(uid)["casetype"] == "batch"
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_secondary_index(self, registry, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        frame = registry.registry
+        for column, lookup in [
+            ("series_uid", registry.by_series),
+            ("study_uid", registry.by_study),
+            ("subject_id", registry.by_subject),
+            ("fileset", registry.by_fileset),
+        ]:
+            for value in frame[column].unique():
+                expected = frame.loc[frame[column] == value, "uid"]
+                assert list(lookup(value)) == list(expected)
+
+        # test_batch set every casetype to 'batch'
+        assert list(registry.by_casetype("batch")) == list(frame["uid"])
+        assert len(registry.by_casetype("calc")) == 0
+        fileset = frame["fileset"].iloc[0]
+        expected = frame.loc[frame["fileset"] == fileset, "uid"]
+        assert list(registry.query(casetype="batch", fileset=fileset)) == list(expected)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_ids(self, registry, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        uids = registry.get_uids()
+        ids = registry.to_ids(uids)
+        assert ids.dtype == np.int32
+        assert len(set(ids)) == len(uids)
+        assert list(registry.to_uids(ids)) == list(uids)
+
+        # Ids survive an update and are not returned with the registration
+        registration = registry.get(uids[0])
+        assert "id" not in registration
+        registry.update(registration)
+        assert registry.to_ids([uids[0]])[0] == ids[0]
+
+        with pytest.raises(FileNotFoundError):
+            registry.to_ids(["nope"])
+        with pytest.raises(FileNotFoundError):
+            registry.to_uids([ids.max() + 1])
+
+        # The id of a removed image is not reassigned, by this or any other instance.
+        last = uids[np.argmax(ids)]
+        registration = registry.get(last)
+        registry.remove(last)
+        registry.add(registration)
+        assert registry.to_ids([last])[0] == ids.max() + 1
+        ImageRegistry(filepath=REGISTRY).remove(last)
+        ImageRegistry(filepath=REGISTRY).add(registration)
+        assert registry.to_ids([last])[0] == ids.max() + 2
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_uid_index(self, registry, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        assert os.path.exists(UID_INDEX)
+        expected = {uid: registry.get(uid) for uid in registry.get_uids()}
+
+        # A new instance reads rows via the uid index without loading the registry
+        cold = ImageRegistry(filepath=REGISTRY)
+        for uid, registration in expected.items():
+            assert cold.get(uid) == registration
+        assert cold._signature == ()
+        with pytest.raises(FileNotFoundError):
+            cold.get("nope")
+
+        # A stale index is ignored and the registry is loaded
+        uid = next(iter(expected))
+        registry.update(dict(expected[uid], casetype="indexed"))
+        assert cold.get(uid)["casetype"] == "indexed"
+        os.utime(REGISTRY, ns=(0, 0))
+        stale = ImageRegistry(filepath=REGISTRY)
+        assert stale.get(uid)["casetype"] == "indexed"
+        assert stale._signature != ()
+
+        # Cold gets return values of the types a loaded registry reads, including for text that
+        # reads as numbers, such as DICOM dates.
+        dated = [dict(registration, study_date="20170913") for registration in expected.values()]
+        assert registry.update_many(registrations=dated).ok
+        cold = ImageRegistry(filepath=REGISTRY)
+        warm = ImageRegistry(filepath=REGISTRY)
+        warm._load()
+        for uid in expected:
+            indexed, loaded = cold.get(uid), warm.get(uid)
+            assert indexed.keys() == loaded.keys()
+            for key, value in loaded.items():
+                assert type(indexed[key]) is type(value), key
+                assert str(indexed[key]) == str(value), key
+        assert cold._signature == ()
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_concurrent_writes(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(os.path.dirname(CONCURRENT_REGISTRY), ignore_errors=True)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        workers = 4
+        with Pool(workers) as pool:
+            pool.map(register, [passports[i::workers] for i in range(workers)])
+
+        registry = ImageRegistry(filepath=CONCURRENT_REGISTRY)
+        assert registry.count == len(passports)
+        assert sorted(registry.get_uids()) == sorted(passport["uid"] for passport in passports)
+        assert len(set(registry.to_ids(registry.get_uids()))) == len(passports)
+        shutil.rmtree(os.path.dirname(CONCURRENT_REGISTRY), ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_concurrent_reads(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(os.path.dirname(CONCURRENT_REGISTRY), ignore_errors=True)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        half = len(passports) // 2
+        registry = ImageRegistry(filepath=CONCURRENT_REGISTRY)
+        registry.add_many(passports[:half])
+
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    for passport in passports[:half]:
+                        assert registry.get(passport["uid"]) == passport
+                    assert registry.count >= half
+                    assert len(registry.query(collection=passports[0]["collection"])) >= half
+                except Exception as e:  # pragma: no cover
+                    errors.append(e)
+
+        readers = [threading.Thread(target=read, daemon=True) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        # The readers are stopped even if a write fails, so the test can't hang on them.
+        try:
+            for passport in passports[half:]:
+                registry.add(registration=passport)
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join(timeout=60)
+
+        assert not any(reader.is_alive() for reader in readers)
+        assert len(errors) == 0
+        assert registry.count == len(passports)
+        shutil.rmtree(os.path.dirname(CONCURRENT_REGISTRY), ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_reload_on_change(self, registry, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        uid = registry.get_uids()[-1]
+        reg = registry.get(uid)
+
+        # Another registry instance removes the registration. The change must be visible.
+        other = ImageRegistry(filepath=REGISTRY)
+        other.remove(uid)
+        assert not registry._exists(uid)
+        with pytest.raises(FileNotFoundError):
+            registry.get(uid)
+
+        other.add(registration=reg)
+        assert registry._exists(uid)
+        assert registry.count == other.count
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
     # ============================================================================================ #
     def test_teardown(self, caplog):
         start = datetime.now()
@@ -260,8 +639,9 @@ class TestRegistry:  # pragma: no cover
         )
         logger.info(double_line)
         # ---------------------------------------------------------------------------------------- #
-        if os.path.exists(REGISTRY):
-            os.remove(REGISTRY)
+        for filepath in (REGISTRY, UID_INDEX, UID_INDEX_METADATA, NEXT_ID):
+            if os.path.exists(filepath):
+                os.remove(filepath)
         # ---------------------------------------------------------------------------------------- #
         end = datetime.now()
         duration = round((end - start).total_seconds(), 1)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_registry_benchmark.py                               #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 01:59:21 am                                                #
+# Modified   : Sunday October 18th 2026 02:57:36 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import shutil
+import inspect
+from time import perf_counter
+from datetime import datetime
+import pytest
+import logging
+
+import pandas as pd
+
+from bcd.data.repo.registry import (
+    ImageRegistry,
+    NormalizedImageRegistry,
+    ParquetImageRegistry,
+)
+from bcd.data.study.image import DICOMPassport
+
+BENCHDIR = "tests/data/benchmark"
+SIZE = 10000
+
+
+# ------------------------------------------------------------------------------------------------ #
+def scale(registrations: list, size: int) -> list:
+    """Replicates the registrations to the requested size, with unique series and image uids.
+
+    Each replica keeps the grouping of files into series.
+    """
+    scaled = []
+    for i in range(size):
+        registration = dict(registrations[i % len(registrations)])
+        registration["series_uid"] = f"{registration['series_uid']}.{i // len(registrations)}"
+        scaled.append(DICOMPassport.create(registration).as_dict())
+    return scaled
+
+
+def timeit(func) -> tuple:
+    """Returns the elapsed time in seconds and the result of calling func."""
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.benchmark
+class TestRegistryBenchmark:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(BENCHDIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_parquet_vs_csv(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        regs = scale(registrations, SIZE)
+        csv = os.path.join(BENCHDIR, "registry.csv")
+        parquet = os.path.join(BENCHDIR, "registry.parquet")
+        ImageRegistry(filepath=csv).add_many(registrations=regs)
+        ParquetImageRegistry(filepath=parquet).add_many(registrations=regs)
+
+        # Open time: the time to load the registry and answer the first query.
+        csv_open, _ = timeit(lambda: ImageRegistry(filepath=csv).count)
+        parquet_open, _ = timeit(lambda: ParquetImageRegistry(filepath=parquet).count)
+
+        # Selection: uid and file_location of calc training images.
+        columns = ["uid", "file_location"]
+
+        def csv_select():
+            registry = ImageRegistry(filepath=csv).registry
+            mask = (registry["casetype"] == "calc") & (registry["fileset"] == "train")
+            return registry.loc[mask, columns]
+
+        csv_time, csv_result = timeit(csv_select)
+        parquet_time, parquet_result = timeit(
+            lambda: ParquetImageRegistry(filepath=parquet).select(
+                columns=columns, casetype="calc", fileset="train"
+            )
+        )
+        assert sorted(csv_result["uid"]) == sorted(parquet_result["uid"])
+
+        msg = (
+            f"\n\tRegistry of {SIZE} images\tCSV\tParquet"
+            f"\n\tOpen (s)\t\t{csv_open:.4f}\t{parquet_open:.4f}"
+            f"\n\tSelect (s)\t\t{csv_time:.4f}\t{parquet_time:.4f}"
+            f"\n\tSelect (bytes)\t\t{csv_result.memory_usage(deep=True).sum()}"
+            f"\t{parquet_result.memory_usage(deep=True).sum()}"
+        )
+        logger.info(msg)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_compact_memory(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        for size in (10000, 100000):
+            regs = scale(registrations, size)
+            filepath = os.path.join(BENCHDIR, f"registry_{size}.csv")
+            ImageRegistry(filepath=filepath).add_many(registrations=regs)
+
+            registry = ImageRegistry(filepath=filepath)
+            compact = registry.registry.memory_usage(deep=True).sum()
+            objects = pd.read_csv(filepath).memory_usage(deep=True).sum()
+            assert compact < objects
+
+            # The compact representation must round-trip losslessly through save.
+            for reg in regs[:100]:
+                assert registry.get(reg["uid"]) == reg
+            registry.remove(uid=regs[0]["uid"])
+            registry.add(registration=regs[0])
+            assert ImageRegistry(filepath=filepath).get(regs[0]["uid"]) == regs[0]
+
+            msg = (
+                f"\n\tRegistry of {size} images: {objects / 1e6:.1f} MB as objects, "
+                f"{compact / 1e6:.1f} MB compact ({objects / compact:.2f}x)"
+            )
+            logger.info(msg)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_normalized_layout(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        regs = scale(registrations, SIZE)
+        plain = os.path.join(BENCHDIR, "denormalized.csv")
+        normal = os.path.join(BENCHDIR, "normalized.csv")
+        ImageRegistry(filepath=plain).add_many(registrations=regs)
+        NormalizedImageRegistry(filepath=normal).add_many(registrations=regs)
+
+        plain_registry = ImageRegistry(filepath=plain)
+        normal_registry = NormalizedImageRegistry(filepath=normal)
+        for reg in regs[:100]:
+            assert normal_registry.get(reg["uid"]) == reg
+
+        plain_disk = os.path.getsize(plain)
+        normal_disk = os.path.getsize(normal) + os.path.getsize(
+            normal.replace(".csv", "_series.csv")
+        )
+        plain_memory = plain_registry.registry.memory_usage(deep=True).sum()
+        normal_memory = (
+            normal_registry._registry.memory_usage(deep=True).sum()
+            + normal_registry._series.memory_usage(deep=True).sum()
+        )
+        plain_get, _ = timeit(lambda: [plain_registry.get(reg["uid"]) for reg in regs])
+        normal_get, _ = timeit(lambda: [normal_registry.get(reg["uid"]) for reg in regs])
+
+        msg = (
+            f"\n\tRegistry of {SIZE} images\tDenormalized\tNormalized"
+            f"\n\tDisk (MB)\t\t{plain_disk / 1e6:.2f}\t\t{normal_disk / 1e6:.2f}"
+            f"\n\tMemory (MB)\t\t{plain_memory / 1e6:.2f}\t\t{normal_memory / 1e6:.2f}"
+            f"\n\tGet (us)\t\t{plain_get / SIZE * 1e6:.0f}\t\t{normal_get / SIZE * 1e6:.0f}"
+        )
+        logger.info(msg)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        shutil.rmtree(BENCHDIR, ignore_errors=True)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+# ================================================================================================ #
+# Project    : Deep Learning Methods for Breast Cancer Detection                                   #
+# Version    : 0.1.0                                                                               #
+# Python     : 3.10.11                                                                             #
+# Filename   : /tests/test_data/test_repo/test_sqlite_registry.py                                  #
+# ------------------------------------------------------------------------------------------------ #
+# Author     : John James                                                                          #
+# Email      : john.james.ai.studio@gmail.com                                                      #
+# URL        : https://github.com/john-james-ai/breast_cancer_detection                            #
+# ------------------------------------------------------------------------------------------------ #
+# Created    : Sunday October 18th 2026 01:58:00 am                                                #
+# Modified   : Sunday October 18th 2026 03:24:34 am                                                #
+# ------------------------------------------------------------------------------------------------ #
+# License    : MIT License                                                                         #
+# Copyright  : (c) 2023 John James                                                                 #
+# ================================================================================================ #
+import os
+import inspect
+from datetime import datetime
+import pytest
+import logging
+
+from bcd.data.repo.sqlite import SQLiteImageRegistry
+from bcd.data.study.image import DICOMPassport
+
+REGISTRY = "tests/data/CBIS-DDSM/registry.db"
+# ------------------------------------------------------------------------------------------------ #
+logger = logging.getLogger(__name__)
+# ------------------------------------------------------------------------------------------------ #
+double_line = f"\n{100 * '='}"
+single_line = f"\n{100 * '-'}"
+
+
+@pytest.mark.sqlite
+class TestSQLiteRegistry:  # pragma: no cover
+    # ============================================================================================ #
+    def test_setup(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(REGISTRY + suffix):
+                os.remove(REGISTRY + suffix)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_add(self, registrations, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = SQLiteImageRegistry(filepath=REGISTRY)
+        passports = [DICOMPassport.create(registration).as_dict() for registration in registrations]
+        result = registry.add_many(registrations=passports[1:] + passports[:1] * 2)
+        assert result.succeeded == [passport["uid"] for passport in passports[1:]]
+        assert isinstance(result.failed[passports[0]["uid"]], FileExistsError)
+        registry.add(registration=passports[0])
+
+        with pytest.raises(FileExistsError):
+            registry.add(registration=passports[0])
+
+        assert registry.count == len(passports)
+        assert len(registry.registry) == len(passports)
+        for passport in passports:
+            assert registry.get(passport["uid"]) == passport
+        registry.close()
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\nCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_update_remove(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        registry = SQLiteImageRegistry(filepath=REGISTRY)
+        uids = registry.get_uids()
+        reg = registry.get(uids[0])
+        reg["casetype"] = "mental"
+        registry.update(registration=reg)
+        assert registry.get(uids[0])["casetype"] == "mental"
+        # An update keeps the image's place in registration order.
+        assert list(registry.get_uids()) == list(uids)
+        assert list(registry.registry["uid"]) == list(uids)
+        assert registry.query(casetype="mental")[0] == uids[0]
+
+        result = registry.remove_many(uids=[uids[1], "xya"])
+        assert result.succeeded == [uids[1]]
+        assert isinstance(result.failed["xya"], FileNotFoundError)
+        assert not registry._exists(uids[1])
+
+        with pytest.raises(FileNotFoundError):
+            registry.update(registration=dict(reg, uid="xya"))
+
+        # The id of a removed image is not reassigned.
+        ids = registry.registry.set_index("uid")["id"]
+        last = ids.idxmax()
+        reg = registry.get(last)
+        registry.remove(last)
+        registry.add(registration=reg)
+        assert registry.to_ids([last])[0] == ids.max() + 1
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)
+
+    # ============================================================================================ #
+    def test_teardown(self, caplog):
+        start = datetime.now()
+        logger.info(
+            "\n\nStarted {} {} at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                start.strftime("%I:%M:%S %p"),
+                start.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(double_line)
+        # ---------------------------------------------------------------------------------------- #
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(REGISTRY + suffix):
+                os.remove(REGISTRY + suffix)
+        # ---------------------------------------------------------------------------------------- #
+        end = datetime.now()
+        duration = round((end - start).total_seconds(), 1)
+
+        logger.info(
+            "\n\tCompleted {} {} in {} seconds at {} on {}".format(
+                self.__class__.__name__,
+                inspect.stack()[0][3],
+                duration,
+                end.strftime("%I:%M:%S %p"),
+                end.strftime("%m/%d/%Y"),
+            )
+        )
+        logger.info(single_line)